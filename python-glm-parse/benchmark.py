@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+# Times Converter imports of generated feeders of increasing size.
+# Every feeder is a chain of meters, each with a transformer to the next one
+# and a number of triplex meters parented to it (the first one also linked by
+# a triplex line), so the number of parent/child links grows with the feeder.
+# The time per object should stay flat as the feeders grow if importing
+# scales linearly.
+
+import os
+import time
+import argparse
+import tempfile
+from glm_parse import Converter
+
+def write_feeder(file_name, parents, children):
+	with open(file_name, 'w') as outfile:
+		outfile.write("// generated feeder, {} parents with {} children each\n".format(parents, children))
+		for p in range(parents):
+			outfile.write("object meter {{\n\tname meter_{p};\n\tphases ABCN;\n\tnominal_voltage 7200;\n}}\n".format(p = p))
+			if p > 0:
+				outfile.write("object transformer {{\n\tname xfmr_{p};\n\tphases ABCN;\n\tfrom meter_{q};\n\tto meter_{p};\n}}\n".format(p = p, q = p - 1))
+			# the first child is also linked by an explicit line, so no dummy edge is needed for it
+			outfile.write("object triplex_line {{\n\tname tl_{p};\n\tphases AS;\n\tfrom meter_{p};\n\tto tm_{p}_0;\n}}\n".format(p = p))
+			for c in range(children):
+				outfile.write("object triplex_meter {{\n\tname tm_{p}_{c};\n\tparent meter_{p};\n\tphases AS;\n}}\n".format(p = p, c = c))
+
+def time_import(file_name, repeat, **kwargs):
+	best = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		converter = Converter(file_name, **kwargs)
+		elapsed = time.perf_counter() - start
+		best = elapsed if best == None else min(best, elapsed)
+	return converter, best
+
+def main():
+
+	parser = argparse.ArgumentParser()
+
+	parser.add_argument('--sizes', required=False, default='1000,2000,4000,8000,16000', help="Comma separated numbers of parent nodes to generate.")
+	parser.add_argument('--children', required=False, type=int, default=4, help="The number of children parented to every node.")
+	parser.add_argument('--repeat', required=False, type=int, default=3, help="Import every feeder this many times and keep the fastest.")
+
+	args = parser.parse_args()
+
+	print("{:>10} {:>10} {:>10} {:>14}".format('parents', 'objects', 'seconds', 'us per object'))
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		for parents in [int(s) for s in args.sizes.split(',')]:
+			file_name = os.path.join(tmp_dir, 'feeder_{}.glm'.format(parents))
+			write_feeder(file_name, parents, args.children)
+
+			converter, seconds = time_import(file_name, args.repeat, calc_pos=False)
+			objects = sum(len(l) for l in converter.lists.values())
+			print("{:>10} {:>10} {:>10.3f} {:>14.2f}".format(parents, objects, seconds, seconds / objects * 1e6))
+
+
+if __name__ == "__main__":
+	main()
@@ -1,2 +1,8 @@
 __all__ = ['converter']
-from .converter import Converter
\ No newline at end of file
+from .converter import Converter
+from .glm_registry import register_glm_type
+from .geo_projection import register_projection
+from .disk_cache import LayoutCache, ParseCache
+from .file_system import FileSystem, MemoryFileSystem
+from .property_store import PropertyStore
+from .symbol_table import SymbolTable
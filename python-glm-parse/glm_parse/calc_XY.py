@@ -1,130 +1,320 @@
 import numpy as np
 import time
-import graphviz
-from graphviz import Source
 import json
 import io
 import math
+import os
 
+from itertools import chain
 
-#This stack overflow link is useful for understanding the projection method used in setXYfromLatLong function: 
-#https://stackoverflow.com/questions/16266809/convert-from-latitude-longitude-to-x-y
-def setXYfromLongLat(converter):
+from glm_parse.node import Substation
+from glm_parse.edge import Edge, Transformer, Regulator
+from glm_parse.geo_projection import parse_coordinate, project
+from glm_parse.force_layout import force_layout
+from glm_parse.radial_layout import radial_layout
+from glm_parse.incremental_layout import incremental_layout
+from glm_parse.partition_layout import partition_layout
+
+# DOT points per DOT inch, the unit graphviz reports positions in
+POINTS_PER_INCH = 72
+
+
+# Index the nodes by name and return the edges between them (dummy edges
+# included) as arrays of node indexes, for the vectorized layout stages.
+# Edges to names that aren't nodes are dropped. With dot_props the edges'
+# len (in DOT inches) and weight from Edge.dot_props are returned as well.
+def node_edge_arrays(converter, dot_props = False):
+    index = {}
+    for i, n in enumerate(converter.lists['nodes']):
+        index.setdefault(n['meta_props']['name'], i)
+
+    edges = converter.lists['edges'] + converter.lists['dummy_edges']
+    src = np.array([index.get(e['meta_props'].get('from'), -1) for e in edges], dtype=np.int64)
+    dst = np.array([index.get(e['meta_props'].get('to'), -1) for e in edges], dtype=np.int64)
+    keep = (src >= 0) & (dst >= 0) & (src != dst)
+
+    if not dot_props:
+        return index, src[keep], dst[keep]
 
-    #earths radius in m
-    EARTH_RADIUS = 6367000.0
+    props = [edge_dot_props(e) for e, k in zip(edges, keep) if k]
+    length = np.array([p[0] for p in props], dtype=float)
+    weight = np.array([p[1] for p in props], dtype=float)
+    return index, src[keep], dst[keep], length, weight
+
+# The len and weight graphviz would use for the edge, as floats
+def edge_dot_props(edge):
+    try:
+        props = edge.cached_dot_props()
+        length = float(props.get('len', edge.MIN_LEN))
+        weight = float(props.get('weight', 1))
+    except (ValueError, TypeError):
+        return float(edge.MIN_LEN), 1.0
+    return max(length, float(edge.MIN_LEN)), weight
+
+# Fill in positions of nodes without one from the mean position of their
+# already placed neighbours, one ring of neighbours at a time. Nodes that
+# aren't connected to any placed node are left unplaced.
+def interpolate_positions(x, y, placed, src, dst):
+    placed = placed.copy()
+    while not placed.all():
+        # edges from a placed node to an unplaced one, in both directions
+        fwd = placed[src] & ~placed[dst]
+        bwd = placed[dst] & ~placed[src]
+        frm = np.concatenate([src[fwd], dst[bwd]])
+        to = np.concatenate([dst[fwd], src[bwd]])
+        if len(to) == 0:
+            break
+
+        count = np.bincount(to, minlength=len(x))
+        reached = count > 0
+        x[reached] = np.bincount(to, weights=x[frm], minlength=len(x))[reached] / count[reached]
+        y[reached] = np.bincount(to, weights=y[frm], minlength=len(x))[reached] / count[reached]
+        placed |= reached
+
+    return placed
+
+# Position nodes from their latitude and longitude. Coordinates are collected
+# into arrays once and projected in bulk with converter.geo_projection (see
+# geo_projection.PROJECTIONS), nodes without coordinates are placed between
+# their neighbours.
+def setXYfromLongLat(converter):
 
     #Used for scaling meters to Dot inches, 3.281ft per meter, 
     # 0.005 feet per DOT inch
     METER2DOT =  3.281 * 0.005 
 
-    max_lat = float("-inf")
-    min_lat = float("inf")
-    max_lng = float("-inf")
-    min_lng = float("inf")
+    nodes = converter.lists['nodes']
+    coordinates = [n.coordinates() for n in nodes]
+    lat = coordinate_array([c[0] for c in coordinates])
+    lng = coordinate_array([c[1] for c in coordinates])
+
+    has_pos = ~np.isnan(lat) & ~np.isnan(lng)
+    if not has_pos.any():
+        return
+
+    x = np.zeros(len(nodes))
+    y = np.zeros(len(nodes))
+    x[has_pos], y[has_pos] = project(lat[has_pos], lng[has_pos], converter.geo_projection)
 
-    #first loop is to calculate phi_0(mid lat point of map) for use in projection
-    for node in converter.lists['nodes']:
-        dot_props = node.dot_props()
-        has_pos = 'latitude' in dot_props.keys() and 'longitude' in dot_props.keys() and dot_props['latitude'] != None and dot_props['longitude'] != None
-        if has_pos:
-            lat = math.radians(float(dot_props['latitude']))
-            lng = math.radians(float(dot_props['longitude']))
-
-            if lat != None:
-                if lat < min_lat:
-                    min_lat = lat
-                if lat > max_lat:
-                    max_lat = lat
-            if lng != None :
-                if lng < min_lng:
-                    min_lng = lng
-                if lng > max_lng:
-                    max_lng = lng
-          
-    #phi_0 should be set to mid lat-point of your map
-    phi_0 = (max_lat + min_lat) /2
-    
     #Set origin, used to 'center' map
-    min_X =  min_lng * math.cos(phi_0) * EARTH_RADIUS * METER2DOT
-    min_Y =  min_lat * EARTH_RADIUS * METER2DOT
-    origin = (min_X,min_Y)
+    x[has_pos] *= METER2DOT
+    y[has_pos] *= METER2DOT
+    x[has_pos] -= x[has_pos].min()
+    y[has_pos] -= y[has_pos].min()
 
-    #second loop sets X and Y
-    savedX = None 
-    savedY = None
-    for node in converter.lists['nodes']:
-        dot_props = node.dot_props()
-        has_pos = 'latitude' in dot_props.keys() and 'longitude' in dot_props.keys() and dot_props['latitude'] != None and dot_props['longitude'] != None
-        if has_pos:
-            lng = math.radians(float(dot_props['longitude']))
-            lat = math.radians(float(dot_props['latitude']))
-        
-            X =  lng * math.cos(phi_0) * EARTH_RADIUS
-            Y =  lat * EARTH_RADIUS
-
-            scaled_X = X * METER2DOT
-            scaled_Y = Y * METER2DOT
-            
-            translated_X = scaled_X - origin[0]
-            translated_Y = scaled_Y - origin[1]
-
-            node['meta_props']['X_pos'] = str(translated_X)
-            node['meta_props']['Y_pos'] = str(translated_Y)
-
-def setXYfromGraph(converter):
-    names = []
-    for n in converter.lists['nodes']:
-        names += [n['meta_props']['name']]
+    placed = has_pos
+    if not placed.all():
+        _, src, dst = node_edge_arrays(converter)
+        placed = interpolate_positions(x, y, has_pos, src, dst)
+
+    # a thousandth of a DOT inch is plenty, and short numbers convert faster
+    x = np.round(x[placed], 3).tolist()
+    y = np.round(y[placed], 3).tolist()
+    for i, X, Y in zip(np.flatnonzero(placed).tolist(), x, y):
+        meta_props = nodes[i]['meta_props']
+        meta_props['X_pos'] = str(X)
+        meta_props['Y_pos'] = str(Y)
+
+# Convert coordinate strings to an array of decimal degrees, NaN where the
+# coordinate is missing or can't be read
+def coordinate_array(values):
+    try:
+        return np.array(['nan' if v == None else v for v in values], dtype=float)
+    except ValueError:
+        # not all plain decimal degrees, convert them one by one
+        coordinates = [parse_coordinate(v) for v in values]
+        return np.array([np.nan if c == None else c for c in coordinates], dtype=float)
 
+# Lay out the nodes with method, converter.position_layout if none is given
+def setXYfromGraph(converter, method = None):
+    method = method or converter.position_layout
     # Use a position layout moth for calcualting the position
-    if converter.position_layout == 'circle':
-        nodePos = calc_circle_positions(names, converter.lists['edges'])
+    # 'circle' is what the radial layout replaced, keep accepting it
+    if method in ('radial', 'circle'):
+        nodePos = calc_radial_positions(converter)
+    elif method == 'incremental':
+        nodePos = calc_incremental_positions(converter)
+    elif method == 'force':
+        nodePos = calc_force_positions(converter)
+    elif method == 'partition':
+        nodePos = calc_partition_positions(converter)
     else:
         nodePos = calc_graphviz_neato(converter)
     
-    for n in converter.lists['nodes']:
+    # the incremental layout only places the new nodes, keeping the
+    # positions there are even of nodes named like a new one
+    pinned = method == 'incremental'
+    for n in converter.unplaced if pinned else converter.lists['nodes']:
         name = n['meta_props']['name']
-        if name in nodePos.keys():
+        if name in nodePos.keys() and not (pinned and n.positioned()):
             n['meta_props']['X_pos'] = str(nodePos[name][0])
             n['meta_props']['Y_pos'] = str(nodePos[name][1])
 
 def setXY(converter):
-    if(converter.calc_geo_pos):
-        setXYfromLongLat(converter)
-    else:
-        setXYfromGraph(converter)
+    # nothing to lay out if the same topology was laid out before. Not for
+    # the incremental layout, whose positions depend on the ones it keeps
+    cache = converter.layout_cache
+    if converter.position_layout == 'incremental' and not converter.calc_geo_pos:
+        cache = None
+    if cache != None:
+        key = cache.layout_key(converter)
+    if cache == None or not cache.load(converter, key):
+        if(converter.calc_geo_pos):
+            setXYfromLongLat(converter)
+        else:
+            setXYfromGraph(converter)
 
-def calc_circle_positions(nodes, p_edges, scale = 1):
-    rotate = None
-    center = None
-    
-    radius_bump = scale / len(nodes)
+        if cache != None:
+            cache.store(converter, key)
 
-    if(len(nodes)) == 1:
-        radius = 0.0
-    else:
-        radius = radius_bump
+    # the nodes still without a position, for the next incremental layout
+    converter.unplaced = [n for n in converter.unplaced if not n.positioned()]
 
-    if rotate is None:
-        rotate = np.pi / len(nodes)
-    
-    initial_theta = rotate
-    npos = {}
-    for n in nodes:
-        theta = (
-            np.linspace(0, 2 * np.pi, len(nodes), endpoint=False) + initial_theta
-        )
-
-        pos = radius * np.column_stack([np.cos(theta), np.sin(theta)])
-        npos.update(zip(nodes,pos))
-        radius += radius_bump
-        initial_theta += rotate
-    
-    return npos
+# Lay out the graph as a radial tree around the SWING bus, or a substation if
+# there is none, in DOT points like graphviz.
+def calc_radial_positions(converter):
+    index, src, dst, length, weight = node_edge_arrays(converter, dot_props = True)
+    nodes = converter.lists['nodes']
+
+    roots = [i for i, n in enumerate(nodes) if n['meta_props'].get('bustype') == 'SWING']
+    roots += [i for i, n in enumerate(nodes) if isinstance(n, Substation)]
+    x, y = radial_layout(len(nodes), src, dst, length * POINTS_PER_INCH, float(Edge.MIN_LEN) * POINTS_PER_INCH, roots)
+
+    # keep every position positive, like graphviz's
+    if len(x):
+        x = np.round(x - x.min() + POINTS_PER_INCH, 3)
+        y = np.round(y - y.min() + POINTS_PER_INCH, 3)
+
+    return {name: [x[i], y[i]] for name, i in index.items()}
+
+# Place the nodes without a position around the positioned nodes they are
+# connected to, in DOT points like graphviz, keeping every position there is
+# (e.g. ones moved by hand). Only the new nodes (converter.unplaced) and the
+# edges at them are looked at, through converter.nodeEdges. New parts of the
+# graph that aren't connected to any positioned node are laid out as radial
+# trees to the right of the rest.
+def calc_incremental_positions(converter):
+    # local indexes of the new nodes, then of the positioned nodes they are
+    # connected to
+    index = {}
+    local = []
+    for n in converter.unplaced:
+        if not n.positioned() and n['meta_props']['name'] not in index:
+            index[n['meta_props']['name']] = len(local)
+            local.append(n)
+    new_count = len(local)
+    if new_count == 0:
+        return {}
+
+    src = []
+    dst = []
+    length = []
+    seen = set()
+    for n in local[:new_count]:
+        for e in converter.nodeEdges(n['meta_props']['name']):
+            if id(e) in seen:
+                continue
+            seen.add(id(e))
+            meta_props = e['meta_props']
+            ends = (meta_props.get('from'), meta_props.get('to'))
+            for name in ends:
+                if name not in index:
+                    other = converter.getObject(name)
+                    if other == None or not other.positioned():
+                        break
+                    index[name] = len(local)
+                    local.append(other)
+            else:
+                if ends[0] != ends[1]:
+                    src.append(index[ends[0]])
+                    dst.append(index[ends[1]])
+                    length.append(edge_dot_props(e)[0] * POINTS_PER_INCH)
+
+    x = np.array([0.0] * new_count + [float(n['meta_props']['X_pos']) for n in local[new_count:]])
+    y = np.array([0.0] * new_count + [float(n['meta_props']['Y_pos']) for n in local[new_count:]])
+    placed = incremental_layout(x, y, np.arange(len(local)) >= new_count, src, dst, length)
+
+    rest = np.flatnonzero(~placed)
+    if len(rest):
+        # the unconnected parts, laid out radially from their sources
+        sub = np.full(len(local), -1)
+        sub[rest] = np.arange(len(rest))
+        src, dst, length = np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64), np.array(length)
+        keep = (sub[src] >= 0) & (sub[dst] >= 0) if len(src) else np.zeros(0, dtype=bool)
+        roots = [j for j, i in enumerate(rest.tolist()) if local[i]['meta_props'].get('bustype') == 'SWING' or isinstance(local[i], Substation)]
+        rx, ry = radial_layout(len(rest), sub[src[keep]], sub[dst[keep]], length[keep], float(Edge.MIN_LEN) * POINTS_PER_INCH, roots)
+
+        # the only pass over the whole model, for where the rest ends
+        positioned = [float(n['meta_props']['X_pos']) for n in converter.lists['nodes'] if n.positioned()]
+        placed_x = x[:new_count][placed[:new_count]].tolist()
+        right = max(positioned + placed_x) + 2 * float(Edge.MIN_LEN) * POINTS_PER_INCH if positioned or placed_x else 0
+        x[rest] = rx - rx.min() + right + POINTS_PER_INCH
+        y[rest] = ry - ry.min() + POINTS_PER_INCH
+
+    x = np.round(x[:new_count], 3).tolist()
+    y = np.round(y[:new_count], 3).tolist()
+    return {n['meta_props']['name']: [x[i], y[i]] for i, n in enumerate(local[:new_count])}
+
+# Lay out the graph in process with force_layout, in DOT points like
+# graphviz. converter.layout_options can set max_iter, time_budget and seed.
+def calc_force_positions(converter):
+    index, src, dst, length, weight = node_edge_arrays(converter, dot_props = True)
+    x, y = force_layout(len(converter.lists['nodes']), src, dst, length * POINTS_PER_INCH, weight, **converter.layout_options)
+
+    # keep every position positive, like graphviz's
+    if len(x):
+        x = np.round(x - x.min() + POINTS_PER_INCH, 3)
+        y = np.round(y - y.min() + POINTS_PER_INCH, 3)
+
+    return {name: [x[i], y[i]] for name, i in index.items()}
+
+# Lay out the graph cut at its transformers, regulators and substations with
+# partition_layout, in DOT points like graphviz. The partitions are laid out
+# in a pool of converter.workers processes (one per CPU if it isn't set).
+# converter.layout_options can set part_layout ('force' or 'radial') and
+# min_size for the partitions, and the options of force_layout.
+def calc_partition_positions(converter):
+    nodes = converter.lists['nodes']
+    index = {}
+    for i, n in enumerate(nodes):
+        index.setdefault(n['meta_props']['name'], i)
+
+    src = []
+    dst = []
+    length = []
+    weight = []
+    cut = []
+    for e in chain(converter.lists['edges'], converter.lists['dummy_edges']):
+        s = index.get(e['meta_props'].get('from'), -1)
+        d = index.get(e['meta_props'].get('to'), -1)
+        if s < 0 or d < 0 or s == d:
+            continue
+        l, w = edge_dot_props(e)
+        src.append(s)
+        dst.append(d)
+        length.append(l * POINTS_PER_INCH)
+        weight.append(w)
+        cut.append(isinstance(e, (Transformer, Regulator)) or isinstance(nodes[s], Substation) or isinstance(nodes[d], Substation))
+
+    roots = [i for i, n in enumerate(nodes) if n['meta_props'].get('bustype') == 'SWING']
+    roots += [i for i, n in enumerate(nodes) if isinstance(n, Substation)]
+    workers = converter.workers or os.cpu_count() or 1
+    x, y = partition_layout(len(nodes), src, dst, length, weight, cut, float(Edge.MIN_LEN) * POINTS_PER_INCH, roots, workers = workers, **converter.layout_options)
+
+    # keep every position positive, like graphviz's
+    if len(x):
+        x = np.round(x - x.min() + POINTS_PER_INCH, 3)
+        y = np.round(y - y.min() + POINTS_PER_INCH, 3)
+
+    return {name: [x[i], y[i]] for name, i in index.items()}
 
 def calc_graphviz_neato(converter):
-    # Load the DOT data into a Graphviz Source Object
+    # imported here so graphviz is only needed when it is used for the layout
+    from graphviz import Source
+
+    # Load the DOT data into a Graphviz Source Object. The statements are in
+    # the order of the model, which the layout depends on, so not the compact
+    # form (grouped by class) that is only for export
     src = Source(converter.to_dot(), engine='dot', format='json')
     #src.render("temp_rendered") 
     
@@ -1,129 +1,288 @@
 import re
-import inspect
 import os.path
 import os
 import math
 import json
 
 from datetime import datetime
+from collections import Counter
+from contextlib import contextmanager, ExitStack
+from itertools import chain
+
+try:
+	import orjson
+except ImportError:
+	orjson = None
 
 from numpy import append
 
 from glm_parse.glm_string import GLMString
 from glm_parse.glm_object import GLMObject
 from glm_parse.glm_line import GLMLine
+from glm_parse.glm_tokenizer import tokenize_glm, parse_object_body, split_lines, source_text, GLM_LINE, GLM_OBJECT, GLM_PARSED, GLM_SPAN
 from glm_parse.node import *
 from glm_parse.edge import *
 from glm_parse.other import *
 from glm_parse.glm_config import *
+from glm_parse.glm_registry import glm_class_name, lookup_glm_type, NODE
 from glm_parse.grab_info_mixin import GrabInfoMixin
 from glm_parse.grab_info_mixin import GrabInfoMixin
-from glm_parse.calc_XY import setXY
-from glm_parse.process_includes import process_includes
+from glm_parse.calc_XY import setXY, setXYfromGraph, setXYfromLongLat
+from glm_parse.glm_preprocessor import GLMPreprocessor
+from glm_parse.file_system import FileSystem, FileReader
+from glm_parse.property_store import PropertyStore
+from glm_parse.symbol_table import SymbolTable
+
+# The most compact JSON text of value, with orjson when it is installed
+def compact_json_dumps(value, level = 0):
+	if orjson != None:
+		return orjson.dumps(value, option = orjson.OPT_NON_STR_KEYS).decode('utf-8')
+	return json.dumps(value, separators = (',', ':'))
+
+# The pieces of text with the whitespace at the start and end of their
+# concatenation stripped, like ''.join(pieces).strip() but without joining
+def strip_pieces(pieces):
+	started = False
+	trailing = []
+	for piece in pieces:
+		if not started:
+			piece = piece.lstrip()
+			if not piece:
+				continue
+			started = True
+		if piece.strip():
+			for held in trailing:
+				yield held
+			trailing = []
+			# the whitespace at its end may be the end of the file
+			stripped = piece.rstrip()
+			yield stripped
+			if len(stripped) < len(piece):
+				trailing.append(piece[len(stripped):])
+		else:
+			trailing.append(piece)
 
 class Converter:
 	VERSION = '0.1'
 	parsing = False
 
-	def __init__(self, infilename, calc_geo_pos = False, calc_pos = True, verbose = False, position_layout = ''):
+	def __init__(self, infilename, calc_geo_pos = False, calc_pos = True, verbose = False, position_layout = '', geo_projection = 'equirectangular', layout_cache = None, base_dir = None, file_system = None, workers = None, lazy = False, columnar = False, symbols = None, parse_cache = None):
 		self.infilename = infilename
+		# every file is read and written through file_system, relative names
+		# are resolved against base_dir rather than the working directory
+		self.file_system = file_system if file_system != None else FileSystem(base_dir)
+		# with more than one worker, included files (and shards of large
+		# files) are parsed in a process pool. The 'partition' layout uses a
+		# pool of this many processes too, one per CPU if it isn't set
+		self.workers = workers
+		# lazy objects keep only their meta props and where they are in the
+		# (memory mapped) file, the rest is decoded when it is used
+		self.lazy = lazy
+		# the symbol_table.SymbolTable parsed keys and values are interned
+		# through, which can be shared by the converters of related models
+		self.symbols = symbols if symbols != None else SymbolTable()
 		self.calc_geo_pos = calc_geo_pos
+		# see geo_projection.PROJECTIONS for the projections calc_geo_pos can use
+		self.geo_projection = geo_projection
 		self.calc_pos = calc_pos
 		self.position_layout = position_layout
+		# extra options for the layout, e.g. max_iter and time_budget for 'force'
+		self.layout_options = {}
+		# a disk_cache.LayoutCache to reuse positions of topologies laid out before
+		self.layout_cache = layout_cache
+		# a disk_cache.ParseCache to reuse the objects of .glm models parsed
+		# before whose files haven't changed
+		self.parse_cache = parse_cache
 		# note configs aren't used for anything currently
 		self.lists = { "nodes": [], "edges": [], "dummy_edges": [], "configs": [], "other": [] }
 		self.glm_lines = {}
+		# number of objects ignored per type that has no class
+		self.unknown_types = {}
+		# the edges and dummy edges at each node name and the objects by
+		# name, kept up to date as objects are added so lookups don't have to
+		# scan the lists
+		self.node_edges = {}
+		self.name_index = {}
+		# the nodes added without a position, for the incremental layout to
+		# place without going through the whole model
+		self.unplaced = []
+		# positions are laid out once, the first time they are needed
+		self.needs_layout = True
+		# a property_store.PropertyStore of the typed properties of every
+		# object, built when the model is imported if columnar is set
+		self.property_store = None
+		# the sha256 of every .glm file of the model by name, as parsed, for
+		# refresh to tell which files changed
+		self.file_digests = {}
 		# Parse the file into class objects
 		if(infilename[-4:] == "json"):
 			self.parse_json(verbose)
 		elif(infilename[-3:] == "glm"):
-			in_files = process_includes(self.infilename, [])
-
-			for in_file in in_files:
-				self.parse_glm(in_file, verbose)
-
-	# Parse the .glm input file into ruby objects
+			self.parse_glm(self.infilename, verbose)
+		if verbose:
+			print("Symbols: {}".format(self.symbols))
+		if columnar:
+			self.buildPropertyStore()
+
+	# Yield the objects of a single .glm file as
+	# (obj_type, id, props, comments, line_number) records without building
+	# any class objects, so callers can stream through large feeders
+	@staticmethod
+	def iter_objects(infile_name, file_system = None):
+		text = (file_system if file_system != None else FileSystem()).read_text(infile_name)
+		for token in tokenize_glm(text):
+			if token[0] == GLM_OBJECT:
+				_, obj_type, index, lines, line_number = token
+				props, comments = parse_object_body(lines)
+				yield (obj_type, index, props, comments, line_number)
+
+	# Parse the .glm input file and the files it includes into ruby objects
 	def parse_glm(self, infile_name, verbose = False):
-		infile = open(infile_name, "r" )
+		try:
+			self.parsing = True
+			# lazy models are quick to parse already, and would be decoded in
+			# full by the cache
+			use_cache = self.parse_cache != None and not self.lazy
+			preprocessor = GLMPreprocessor(infile_name, file_system = self.file_system, lazy = self.lazy, digest = True)
+			self.file_digests = preprocessor.digests
+			cache_key = None
+			if use_cache:
+				cache_key = self.parse_cache.parse_key(self, preprocessor)
+				if self.parse_cache.load(self, cache_key):
+					return
+			if self.lazy:
+				tokens = preprocessor.span_tokens()
+			elif preprocessor.use_pool(self.workers):
+				tokens = preprocessor.parallel_tokens(self.workers)
+			else:
+				tokens = preprocessor.tokens()
+			# objects are added in include order either way, so the name
+			# index and dummy edges come out the same
+			self.parse_tokens(tokens, verbose)
+			if cache_key != None:
+				self.parse_cache.store(self, cache_key)
+		finally:
+			self.parsing = False
+
+	# Build the objects from a stream of glm_preprocessor tokens
+	def parse_tokens(self, tokens, verbose = False):
+		file_lines = {}
+		for token in tokens:
+			if token[0] == GLM_LINE:
+				#if there is not an object just save the line
+				_, file_name, line_number, line, active = token
+				lines = file_lines.get(file_name)
+				if lines == None:
+					lines = file_lines[file_name] = self.glm_lines.setdefault(file_name, {})
+				lines[line_number] = GLMLine(line_number, line, file_name)
+				continue
+
+			source = raw_props = None
+			if token[0] == GLM_PARSED:
+				_, file_name, obj_type, index, props, comments, line_start = token[:7]
+				if len(token) > 7:
+					raw_props = token[7]
+			elif token[0] == GLM_SPAN:
+				_, file_name, obj_type, index, source, line_start = token
+				props = comments = None
+			else:
+				_, file_name, obj_type, index, lines, line_start = token
+				props = comments = None
+
+			# see if there's a class (defined in module) that corresponds to the obj_type
+			# of object we've found
+			class_name = glm_class_name(obj_type)
+			glm_type = lookup_glm_type(class_name)
+			if glm_type == None:
+				self.unknownType(class_name)
+				continue
+
+			# if there is a class corresponding to the current object obj_type,
+			# instantiate it and let it initialize itself based on #lines
+			if verbose:
+				print( "Parsing {}".format(index))
+			if source != None:
+				props, comments = self.symbols.parse_body(split_lines(source_text(source)))
+			elif props == None:
+				props, comments = self.symbols.parse_body(lines)
+			else:
+				props = self.symbols.intern_props(props)
+			obj = glm_type.klass(props=props, comments=comments, line_number=line_start, id=index, obj_type=class_name, file_name=file_name, source=source, raw_props=raw_props)
+			self.addObject(obj, glm_type)
+
+	# Parse again just the .glm files that changed since the model was parsed
+	# (or last refreshed), and splice their objects into the lists and
+	# indexes in place of the old ones. The objects of the other files are
+	# added again as they are, in include order, so the indexes and dummy
+	# edges come out as a full parse would make them. Nodes keep their
+	# positions, new nodes are placed by the incremental layout (or from
+	# their coordinates, with calc_geo_pos). Files whose directives changed,
+	# or added or removed includes, mean the whole model is parsed again.
+	# Returns the names of the files parsed.
+	def refresh(self, verbose = False):
+		if not self.file_digests:
+			return []
+		preprocessor = GLMPreprocessor(self.infilename, file_system = self.file_system, lazy = self.lazy, digest = True)
+		digests = preprocessor.digests
+		changed = [key for key in digests if digests[key] != self.file_digests.get(key)]
+		same_files = list(digests) == list(self.file_digests)
+		if not changed and same_files:
+			return []
+		if not same_files or any(preprocessor.files[key][0] != None for key in changed):
+			changed = list(digests)
+			self.glm_lines = {}
+
+		# the objects of each file in the order they were parsed, and the
+		# node positions by name
+		by_file = {}
+		for obj in chain(self.lists['nodes'], self.lists['edges'], self.lists['configs'], self.lists['other']):
+			by_file.setdefault(obj['meta_props']['file_name'], []).append(obj)
+		for objs in by_file.values():
+			objs.sort(key = lambda obj: obj['meta_props']['line_number'])
+		positions = {}
+		for n in self.lists['nodes']:
+			meta_props = n['meta_props']
+			if 'X_pos' in meta_props and 'Y_pos' in meta_props:
+				positions[meta_props['name']] = (meta_props['X_pos'], meta_props['Y_pos'])
 
+		self.lists = { "nodes": [], "edges": [], "dummy_edges": [], "configs": [], "other": [] }
+		self.node_edges = {}
+		self.name_index = {}
+		self.unplaced = []
+		self.file_digests = digests
 		try:
 			self.parsing = True
-			#infile = open( self.infilename, "r" )
-			current_line = 0
-
-			while True:
-				line = infile.readline()
-				if line == '':
-					break
-				if re.match('^object', line.strip()):
-					# we've found a line like "object capacitor:2076 {"
-					# the index is "capacitor:2076"
-					index = line.split()[1].strip(';')
-					line_start = current_line
-					# the obj_type is "capacitor"
-					obj_type = GLMString(index.split(':')[0].strip('{'))
-					# gather up all the lines of input that define the current object
-					# into lines
-					lines = []
-					max_lines = 5000 # use max int with decprement in loop, not reasonable to have 5000 lines ina  single object for GLM
-					while max_lines > 0:
-						classLine = infile.readline()
-						current_line += 1
-						if re.match('^}', classLine.strip()):
-							break
-						lines.append(classLine)
-						max_lines -= 1
-					else:
-						raise Exception("Failed line parsing for {} on line {}, exceeded max line limit of 5,000.".format(obj_type, current_line))
-
-					# see if there's a class (defined in module) that corresponds to the obj_type
-					# of object we've found
-					klass = None
-					try:
-						klass = globals()[obj_type.to_class_name()]
-						if verbose:
-							print( "Klass = {}".format(obj_type.to_class_name()))
-					except:
-						print("No class defined for {}".format(obj_type.to_class_name()))
-
-					# first check if klass is a class obj_type object
-					# make sure klass is a an ancestor of GLMObject
-					if klass != None and inspect.isclass(klass) and 'GLMObject' in (k.__name__ for k in klass.mro()):
-						# if there is a class corresponding to the current object obj_type,
-						# instantiate it and let it initialize itself based on #lines
-						if verbose:
-							print( "Parsing {}".format(index))
-						obj = klass(lines=lines)
-						obj.set_meta_props(line_start, index, obj_type.to_class_name(), infile_name)
-
-						# add the new object to the appropriate list (:nodes, :edges, etc.)
-						# using the list prop of the class to sort the object into the proper list type
-						self.lists[obj.list()].append(obj)
-						# if the new object has a "parent" attribute, create and save
-						# a dummy edge linking the parent to the new object
-						if obj['meta_props'].get('parent') != None and 'Node' in (k.__name__ for k in klass.mro()):
-							self.addDummyEdge(obj)
-						
-
-					else:
-						print("Ignoring {}".format(index))
-
-						if verbose:
-							print("Ignoring {}".format(index))
+			for key in digests:
+				if key in changed:
+					# emptied rather than removed, so the files stay in order
+					self.glm_lines[key] = {}
+					self.parse_tokens(preprocessor.span_tokens([key]) if self.lazy else preprocessor.tokens([key]), verbose)
 				else:
-					#if there is not an object just save the line
-					if(infile_name not in self.glm_lines.keys()):
-						self.glm_lines[infile_name] = {}
-
-					self.glm_lines[infile_name][current_line] = GLMLine(current_line, line, infile_name)
-				current_line += 1
-
-			if self.calc_pos:
-				setXY(self)
+					for obj in by_file.get(key, []):
+						self.addObject(obj, lookup_glm_type(obj['meta_props']['obj_type']))
 		finally:
-			if infile:
-				infile.close()
-				self.parsing = False
+			self.parsing = False
+
+		if not self.needs_layout:
+			# the nodes parsed again are the unplaced ones
+			for n in self.unplaced:
+				meta_props = n['meta_props']
+				if 'X_pos' not in meta_props and meta_props['name'] in positions:
+					meta_props['X_pos'], meta_props['Y_pos'] = positions[meta_props['name']]
+			# geographic positions follow the coordinates in the files, only
+			# nodes that have none and aren't near any that do are placed by
+			# the incremental layout
+			with self.mappedFiles():
+				if self.calc_geo_pos:
+					setXYfromLongLat(self)
+				setXYfromGraph(self, 'incremental')
+			self.unplaced = [n for n in self.unplaced if not n.positioned()]
+		# stored without the positions, like the cache entry of a full parse
+		if self.parse_cache != None and not self.lazy:
+			self.parse_cache.store(self, self.parse_cache.parse_key(self, preprocessor))
+		if self.property_store != None:
+			self.buildPropertyStore()
+		return changed
 
 	# Parse the json input file into ruby objects
 	def parse_json(self, verbose = False):
@@ -131,256 +290,386 @@ class Converter:
 		infile = None
 		try:
 			self.parsing = True
-			infile = open( self.infilename, "r" )
+			infile = self.file_system.open(self.infilename, "r")
 			#convert json file to dictionary
 			graph_dict = json.load(infile)
+			# older project imports stored the document as a JSON string
+			if isinstance(graph_dict, str):
+				graph_dict = json.loads(graph_dict)
 
 			self.glm_lines = graph_dict['glm_lines']
 			#loop through each obj_type ex. [nodes,edges] then loop through each obj in each list, ex. [node1, node2, ...]
 			objects = graph_dict['objects']
 			for key in objects.keys():
 				for obj_dict in objects[key]:
+					# dummy edges are created again from the parent of their node
+					if obj_dict['meta_props'].get('dummy'):
+						continue
+
 					obj_type = obj_dict['meta_props']['obj_type']
-					klass = None
-					try:
-						klass = globals()[obj_type]
-						if verbose:
-							print( "Klass = {}".format(obj_type))
-					except:
-						#assert False, "No class defined for {}".format(obj_type)
-						print("No class defined for {}".format(obj_type))
-
-					if klass != None and inspect.isclass(klass) and 'GLMObject' in (k.__name__ for k in klass.mro()):
-						# if there is a class corresponding to the current object type,
-						# instantiate it and let it initialize itself based on #lines
-						if verbose:
-							print( "Parsing {}".format(obj_type))
-						obj = klass(obj_dict = obj_dict)
-						# add the new object to the appropriate list (:nodes, :edges, etc.)
-						# using the list prop of the class to sort the object into the proper list type
-						self.lists[obj.list()].append(obj)
-						# if the new object has a "parent" attribute, create and save
-						# a dummy edge linking the parent to the new object
-						if obj['meta_props'].get('parent') != None and 'Node' in (k.__name__ for k in klass.mro()):
-							self.addDummyEdge(obj)
-						
-
-					else:
-						if verbose:
-							print("Ignoring {}".format(obj_type))
+					glm_type = lookup_glm_type(obj_type)
+					if glm_type == None:
+						self.unknownType(obj_type)
+						continue
+
+					# if there is a class corresponding to the current object type,
+					# instantiate it and let it initialize itself based on #lines
+					if verbose:
+						print( "Parsing {}".format(obj_type))
+					for props in ('glm_props', 'meta_props'):
+						if isinstance(obj_dict.get(props), dict):
+							obj_dict[props] = self.symbols.intern_dict(obj_dict[props])
+					self.addObject(glm_type.klass(obj_dict = obj_dict), glm_type)
 		
-			if self.calc_pos:
-				setXY(self)
 		finally:
 			if infile:
 				infile.close()
 				self.parsing = False
 
 
-	def to_dot(self, creator = ''):
+	# Lay out the node positions for the whole model, using method
+	# ('graphviz', 'radial', 'force', 'incremental', 'partition') or the
+	# position_layout given to the Converter. options are passed on to the
+	# layout, see layout_options
+	def layout(self, method = None, **options):
+		if method != None:
+			self.position_layout = method
+		self.layout_options.update(options)
+		self.needs_layout = False
+		with self.mappedFiles():
+			setXY(self)
+
+	# to_dot and to_json call this so the layout only runs when positions are
+	# actually used, and only once no matter how many files were included
+	def ensureLayout(self):
+		if self.calc_pos and self.needs_layout:
+			self.layout()
+
+	# Compute the DOT props of every node and edge that doesn't have them
+	# cached, class by class so the parts of the style that vary between
+	# objects are computed in one pass per class (see GLMObject.cache_styles)
+	def computeStyles(self):
+		classes = {}
+		for obj in chain(self.lists['nodes'], self.lists['edges'], self.lists['dummy_edges']):
+			if not obj.has_dot_cache():
+				classes.setdefault(type(obj), []).append(obj)
+		with self.mappedFiles():
+			for klass, objs in classes.items():
+				klass.cache_styles(objs)
+
+	# Map the files of lazy objects into memory while the block runs, so a
+	# pass over every object reads their bodies from the maps rather than
+	# opening the files again for each one. The maps are closed after it,
+	# the files aren't kept open (or locked, on Windows) in between
+	@contextmanager
+	def mappedFiles(self):
+		readers = set()
+		if self.lazy:
+			for obj in chain(self.lists['nodes'], self.lists['edges'], self.lists['configs'], self.lists['other']):
+				if obj.source != None and isinstance(obj.source[0], FileReader):
+					readers.add(obj.source[0])
+		with ExitStack() as stack:
+			for reader in readers:
+				stack.enter_context(reader)
+			yield
+
+	# Yield the DOT file a piece at a time. With compact, the nodes and edges
+	# of each class are written in a subgraph whose node/edge defaults are
+	# their most common attributes, so each line only has what differs.
+	def iter_dot(self, creator = '', compact = False):
+		self.ensureLayout()
+		self.computeStyles()
 		creator = creator if creator else '[unknown]'
 		feeder_name = ""
 
-		dotFileStr = 'graph "' + feeder_name + '" {\n'
-		dotFileStr += "	label=\" {} ".format(feeder_name)
-		dotFileStr += "	using glm2dot_python version {}\"; \n".format(self.VERSION)
-		dotFileStr += '	fontsize="24";\n'
-		dotFileStr += '	node [fontname="Helvetica", fontcolor="/x11/gray50", fontsize="8", colorscheme="accent8"];\n'
-		dotFileStr += '	edge [colorscheme="accent8"];\n'
-		for node in self.lists['nodes']:
-			dotFileStr += '	{}\n'.format(node.to_dot())
-		
-		for edge in self.lists['edges']:
-			dotFileStr += '	{}\n'.format(edge.to_dot())
-	
-		for edge in self.lists['dummy_edges']:
-			dotFileStr += '	{}\n'.format(edge.to_dot())
-		
-		dotFileStr += '}\n'
-
-		return dotFileStr
-	
-	def writeDot(self, outfilename, creator = ''):
-		outfile = open(outfilename,'w')
-		outfile.write(self.to_dot(creator))
-		outfile.close()
+		yield 'graph "' + feeder_name + '" {\n'
+		yield "	label=\" {} ".format(feeder_name)
+		yield "	using glm2dot_python version {}\"; \n".format(self.VERSION)
+		yield '	fontsize="24";\n'
+		yield '	node [fontname="Helvetica", fontcolor="/x11/gray50", fontsize="8", colorscheme="accent8"];\n'
+		yield '	edge [colorscheme="accent8"];\n'
+
+		if compact:
+			for kind, objs in (('node', self.lists['nodes']), ('edge', self.lists['edges'] + self.lists['dummy_edges'])):
+				for lines in self.iter_dot_classes(kind, objs):
+					yield lines
+		else:
+			for node in self.lists['nodes']:
+				yield '	{}\n'.format(node.to_dot())
+
+			for edge in self.lists['edges']:
+				yield '	{}\n'.format(edge.to_dot())
+
+			for edge in self.lists['dummy_edges']:
+				yield '	{}\n'.format(edge.to_dot())
+
+		yield '}\n'
+
+	# The objects grouped by class, each class in a subgraph with its most
+	# common attributes as the defaults for kind ('node' or 'edge'). Graphviz
+	# only applies the defaults to a node when it is first declared, so a
+	# node declared again (like the unnamed NO_NAME_FOUND ones) is written
+	# with all its attributes, as the full output would set them
+	def iter_dot_classes(self, kind, objs):
+		declared = set()
+		classes = {}
+		for obj in objs:
+			classes.setdefault(type(obj), []).append(obj)
+
+		for klass, members in classes.items():
+			# the defaults are the most common value of every attribute all
+			# of the members have, members with another value override it
+			attrs = [obj.dot_attrs() for obj in members]
+			counts = {}
+			for (k, v), count in Counter(chain.from_iterable(attrs)).items():
+				counts.setdefault(k, []).append((count, v))
+			defaults = {}
+			for k, values in counts.items():
+				count, v = max(values, key=lambda item: item[0])
+				if sum(c for c, _ in values) == len(members) and count > 1:
+					defaults[k] = v
+
+			yield '	subgraph {\n'
+			if defaults:
+				yield '		{}\n'.format(GLMObject.dot_line(kind, list(defaults.items())))
+			for obj, a in zip(members, attrs):
+				head = obj.dot_head()
+				if head in declared:
+					yield '		{}\n'.format(GLMObject.dot_line(head, a))
+				else:
+					if kind == 'node':
+						declared.add(head)
+					yield '		{}\n'.format(GLMObject.dot_line(head, a, defaults))
+			yield '	}\n'
+
+	def to_dot(self, creator = '', compact = False):
+		return ''.join(self.iter_dot(creator, compact))
+
+	# Write the DOT file to outfilename, a file name or an open file
+	def writeDot(self, outfilename, creator = '', compact = False):
+		if hasattr(outfilename, 'write'):
+			outfilename.writelines(self.iter_dot(creator, compact))
+		else:
+			with self.file_system.open(outfilename, 'w') as f:
+				f.writelines(self.iter_dot(creator, compact))
 	
-	def to_json(self,creator = ''):
+	# Yield the GLM-JSON document a piece at a time, one object per piece, so
+	# it can be written out without building the whole document first.
+	# indent=4 gives the same text as json.dumps(..., indent=4) of the
+	# document, indent=None the most compact form.
+	def iter_json(self, creator = '', indent = 4):
+		self.ensureLayout()
+		with self.mappedFiles():
+			for piece in self.iter_json_pieces(creator, indent):
+				yield piece
+
+	def iter_json_pieces(self, creator, indent):
+		self.computeStyles()
 		creator = creator if creator else '[unknown]'
 		feeder_name = "feeder_name"
 
 		#feeder_name = os.path.splitext(os.path.basename(self.infilename))[0]
-		
-		node_list = []
-		edge_list = []
-		other_list = []
-		config_list = []
-		for node in self.lists['nodes']:
-			#node.to_json returns a dictionary
-			node_list.append(node.to_json())
-
-		for edge in self.lists['edges']:
-			#edge.to_json returns a dictionary
-			edge_list.append(edge.to_json())
-
-		for dummy_edge in self.lists['dummy_edges']:
-			edge_list.append(dummy_edge.to_json())
-
-
-		for other in self.lists['other']:
-			#other.to_json returns a dictionary
-			other_list.append(other.to_json())
-
-		for config in self.lists['configs']:
-			#other.to_json returns a dictionary
-			config_list.append(config.to_json())
-
-		json_data = {
-    		"header" : {
-        		"label" : "Feeder {fname} Scale: 1in = {scale_ft}ft Created by {created_by} using glm2dot_python version {version}".format(
-            		fname  = feeder_name,
-            		scale_ft = "1/Edge.LEN_SCALE",
-            		created_by = "creator",
-            		version = "version"
-        		),
-        		"fontsize" : "24",
-				"node" : {"fontname" : "Helvetica", "fontcolor" : "/x11/gray50", "fontsize" : "8", "colorscheme" : "accent8"},
-				"edge" : {"colorscheme" : "accent8"}
-			},
-			"glm_lines":self.glm_lines,
-			"objects" : {
-				"nodes" : node_list,
-				"edges" : edge_list,
-				"other" : other_list,
-				"configs" : config_list
-			}
+
+		header = {
+			"label" : "Feeder {fname} Scale: 1in = {scale_ft}ft Created by {created_by} using glm2dot_python version {version}".format(
+				fname  = feeder_name,
+				scale_ft = "1/Edge.LEN_SCALE",
+				created_by = "creator",
+				version = "version"
+			),
+			"fontsize" : "24",
+			"node" : {"fontname" : "Helvetica", "fontcolor" : "/x11/gray50", "fontsize" : "8", "colorscheme" : "accent8"},
+			"edge" : {"colorscheme" : "accent8"}
+		}
+
+		objects = {
+			"nodes" : [self.lists['nodes']],
+			"edges" : [self.lists['edges'], self.lists['dummy_edges']],
+			"other" : [self.lists['other']],
+			"configs" : [self.lists['configs']]
 		}
 
-		return json.dumps(json_data, indent = 4)
+		if indent == None:
+			dumps = compact_json_dumps
+			def nested(level):
+				return ''
+			item_sep, key_sep = ',', ':'
+		else:
+			def dumps(value, level):
+				# json.dumps indents nested lines as if value were at the top level
+				return json.dumps(value, indent = indent).replace('\n', nested(level))
+			def nested(level):
+				return '\n' + ' ' * (indent * level)
+			item_sep, key_sep = ',', ': '
+
+		yield '{' + nested(1) + '"header"' + key_sep + dumps(header, 1)
+		yield item_sep + nested(1) + '"glm_lines"' + key_sep + dumps(self.glm_lines, 1)
+		yield item_sep + nested(1) + '"objects"' + key_sep + '{'
+		for i, (key, lists) in enumerate(objects.items()):
+			yield (item_sep if i else '') + nested(2) + '"' + key + '"' + key_sep + '['
+			first = True
+			for objs in lists:
+				for obj in objs:
+					#obj.to_json returns a dictionary
+					yield ('' if first else item_sep) + nested(3) + dumps(obj.to_json(), 3)
+					first = False
+			yield ('' if first else nested(2)) + ']'
+		yield nested(1) + '}' + nested(0) + '}'
+
+	def to_json(self, creator = '', indent = 4):
+		return ''.join(self.iter_json(creator, indent))
 	
-	def writeJson(self, outfilename, creator = ''):
-		outfile = open(outfilename,'w')
-		outfile.write(self.to_json())
-		outfile.close()
+	# Write the GLM-JSON document to outfilename, a file name or an open file,
+	# as it is generated
+	def writeJson(self, outfilename, creator = '', indent = 4):
+		if hasattr(outfilename, 'write'):
+			outfilename.writelines(self.iter_json(creator, indent))
+		else:
+			with self.file_system.open(outfilename, 'w') as f:
+				f.writelines(self.iter_json(creator, indent))
 		
 	def to_glm_dict(self,creator = ''):
-		
-		glm_str_dict = {}
+		# maps file name to a string representing the file
+		return {f: ''.join(pieces) for f, pieces in self.iter_glm_files(creator)}
+
+	# Yield (file name, pieces) for every file of the model, where the
+	# pieces of text make up the file when joined
+	def iter_glm_files(self, creator = ''):
 		creator = creator if creator else '[unknown]'
 
 		file_list = list(self.glm_lines.keys())
-		
+		file_objs = {}
 		obj_types = ['nodes', 'edges', 'other', 'configs']
-		#for each obj_type get all instances of that obj in the file f and use that to check length of the file
-
 		for obj_type in obj_types:
 			for obj in self.lists[obj_type]:
-				if(obj['meta_props']['file_name'] not in file_list):
-					file_list.append(obj['meta_props']['file_name'])
-
-
-		for f in file_list:
-			obj_list = []
-			#for each obj_type get all instances of that obj in the file f and use that to check length of the file
-
-			for obj_type in obj_types:
-				for obj in self.lists[obj_type]:
-					if(obj['meta_props']['file_name'] == f):
-						obj_list.append(obj)
-
-			if(f in self.glm_lines.keys()):
-				length = self.get_file_len(obj_list, self.glm_lines[f].keys())
+				f = obj['meta_props']['file_name']
+				if f not in file_objs:
+					file_objs[f] = []
+					if f not in self.glm_lines:
+						file_list.append(f)
+				file_objs[f].append(obj)
+
+		with self.mappedFiles():
+			for f in file_list:
+				yield f, strip_pieces(self.iter_glm_lines(self.glm_lines.get(f, {}), file_objs.get(f, [])))
+
+	# Merge the preserved lines and the objects of a file by their line
+	# numbers, in one pass. Line numbers nothing was written to come out as a
+	# single space, objects without a line number (e.g. added in the UI) go
+	# at the end. Where objects overlap lines, the last one written wins.
+	def iter_glm_lines(self, glm_lines, obj_list):
+		positioned = []
+		unpositioned = []
+		size = 0
+		for line_num, glm_line in glm_lines.items():
+			try:
+				line_num = int(line_num)
+			except (TypeError, ValueError):
+				line_num = -1
+			if line_num < 0:
+				unpositioned.append(glm_line['line'])
 			else:
-				length = self.get_file_len(obj_list)
-
-
-			glm_file_arr = [' '] * length * 2
-
-			if(f in self.glm_lines.keys()):
-				for line_num in self.glm_lines[f].keys():
-						try:
-							glm_file_arr[int(line_num)] = self.glm_lines[f][line_num]['line']
-						except:
-							glm_file_arr.append(self.glm_lines[f][line_num]['line'])
-
-			glm_file_arr = self.insert_into_glm(obj_list, glm_file_arr)
-
-			glm_str_dict[f] = "".join(glm_file_arr).strip()
-
-		return glm_str_dict
+				positioned.append((line_num, [glm_line['line']]))
+				size = max(size, line_num + 1)
 
+		end_objs = []
+		for obj in obj_list:
+			line_number = obj['meta_props'].get('line_number')
+			lines = [line + '\n' for line in obj.to_glm().split('\n')]
+			if line_number == None or int(line_number) < 0:
+				end_objs += lines
+			else:
+				positioned.append((int(line_number), lines))
+				size = max(size, int(line_number) + len(lines))
 
+		glm_file_arr = [' '] * size
+		for line_num, lines in positioned:
+			glm_file_arr[line_num:line_num + len(lines)] = lines
 
+		return chain(glm_file_arr, unpositioned, end_objs)
 
 	def to_glm(self,creator = '', one_file=True):
-
-		glm_dict = self.to_glm_dict()
-		glm_file_str = ''
-		for f in glm_dict.keys():
-			glm_file_str += glm_dict[f]
-		return glm_file_str
+		return ''.join(''.join(pieces) for f, pieces in self.iter_glm_files(creator))
 	
 
 	#TODO: make sure glm_line dict mapping includes file name
 	def writeGlm(self, outfilename=None, outfoldername = 'output/', creator = ''):
 		if(outfilename == None):
-			glm_dict = self.to_glm_dict()
-			#glm_dict is a dictionary that maps file name to a string representing the file.
-			for f in glm_dict.keys():
+			#each file of the model is written to its own file under outfoldername
+			for f, pieces in self.iter_glm_files(creator):
 				try:
 					path = os.path.dirname(outfoldername+f)
-					os.makedirs(path, exist_ok=True)
+					self.file_system.makedirs(path)
 				except OSError as e:
 					print(f"An error has occurred: {e}")
 
-				outfile = open(outfoldername+f,'w')
-				outfile.write(glm_dict[f])
-				outfile.close()
+				with self.file_system.open(outfoldername+f,'w') as outfile:
+					outfile.writelines(pieces)
 		else:
-			outfile = open(outfilename,'w')
-			outfile.write(self.to_glm())
-			outfile.close()
-
-	def get_file_len(self, obj_list, all_lines = []):
-		temp_arr = []
-		for obj in obj_list:
-			if('line_number' in obj['meta_props'].keys()):
-				line_number = obj['meta_props']['line_number']
-
-				lines = obj.to_glm().split('\n')
-				for line in lines:
-					temp_arr.insert(line_number, line+'\n')
-					line_number += 1
-		return(len(temp_arr) + len(all_lines))
-
-	def insert_into_glm(self, obj_list, glmFileArr):
-		for obj in obj_list:
-			if('line_number' not in obj['meta_props'].keys()):
-				line_number = -1
-			else:
-				line_number = obj['meta_props']['line_number']
-
-			lines = obj.to_glm().split('\n')
-			for line in lines:
-				glmFileArr[line_number] = line+'\n'
-				line_number += 1
-
-		return glmFileArr
+			with self.file_system.open(outfilename,'w') as outfile:
+				for f, pieces in self.iter_glm_files(creator):
+					outfile.writelines(pieces)
+
+	# (Re)build the property store from the objects of the model, e.g. after
+	# they were edited. Dummy edges have no properties and are left out.
+	def buildPropertyStore(self):
+		with self.mappedFiles():
+			self.property_store = PropertyStore(chain(self.lists['nodes'], self.lists['edges'], self.lists['other'], self.lists['configs']))
+		return self.property_store
+
+	# add the new object to the appropriate list (:nodes, :edges, etc.)
+	# using the list type resolved for its class when it was registered
+	def addObject(self, obj, glm_type):
+		self.lists[glm_type.list_type].append(obj)
+
+		meta_props = obj['meta_props']
+		if meta_props['name'] != 'NO_NAME_FOUND':
+			self.name_index.setdefault(meta_props['name'], obj)
+
+		if glm_type.list_type == 'edges':
+			self.indexEdge(obj)
+		elif glm_type.kind == NODE and not obj.positioned():
+			self.unplaced.append(obj)
+
+		# if the new object has a "parent" attribute, create and save
+		# a dummy edge linking the parent to the new object
+		if glm_type.kind == NODE and meta_props.get('parent') != None:
+			self.addDummyEdge(obj)
+
+	# objects without a class are ignored, only report each type once
+	def unknownType(self, class_name):
+		if class_name not in self.unknown_types:
+			self.unknown_types[class_name] = 0
+			print("No class defined for {}, ignoring these objects".format(class_name))
+		self.unknown_types[class_name] += 1
+
+	# the first object parsed with the given name, or None
+	def getObject(self, name):
+		return self.name_index.get(name)
+
+	# the edges and dummy edges from or to the named node
+	def nodeEdges(self, name):
+		return self.node_edges.get(name, ())
+
+	def indexEdge(self, edge):
+		meta_props = edge['meta_props']
+		self.node_edges.setdefault(meta_props.get('from'), []).append(edge)
+		if meta_props.get('to') != meta_props.get('from'):
+			self.node_edges.setdefault(meta_props.get('to'), []).append(edge)
+
+	# whether there is an edge (not a dummy one) from _from to _to. The edges
+	# at whichever end has fewer are looked through
+	def hasEdge(self, _from, _to):
+		edges = min(self.nodeEdges(_from), self.nodeEdges(_to), key = len)
+		for e in edges:
+			meta_props = e['meta_props']
+			if meta_props.get('from') == _from and meta_props.get('to') == _to and not meta_props.get('dummy'):
+				return True
+		return False
 
 	def addDummyEdge(self, obj):
-		edge_already_exists = False
-
-		#check if edge already exists
-		for e in self.lists['edges']:
-			if(e['meta_props']['from'] == obj['meta_props']['parent'] and e['meta_props']['to'] == obj['meta_props']['name']):
-				edge_already_exists = True
-
-		if(not edge_already_exists):
+		#only link parent and child if there isn't an edge between them already
+		if(not self.hasEdge(obj['meta_props']['parent'], obj['meta_props']['name'])):
 			dummy = Edge.dummy(obj, obj['meta_props']['parent'], obj['meta_props']['name'] )
 			self.lists['dummy_edges'].append(dummy)
-
-
-
-
-		
-		
+			self.indexEdge(dummy)
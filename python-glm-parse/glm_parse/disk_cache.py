@@ -0,0 +1,229 @@
+import io
+import os
+import gc
+import json
+import pickle
+import hashlib
+import tempfile
+
+from glm_parse.glm_object import GLMObject
+
+# Content addressed caches kept in a directory on disk.
+# Every entry is one file named by its key. Reading an entry touches it, so
+# the oldest modification times belong to the least recently used entries,
+# and those are removed first once the directory grows past max_size bytes.
+class DiskCache:
+	# default size limit of a cache directory in bytes
+	MAX_SIZE = 256 * 1024 * 1024
+	SUFFIX = '.cache'
+
+	def __init__(self, directory, max_size = MAX_SIZE):
+		self.directory = os.path.abspath(directory)
+		self.max_size = max_size
+		os.makedirs(self.directory, exist_ok=True)
+
+	# hex digest of a list of strings, stable across runs and platforms
+	@staticmethod
+	def hash_key(parts):
+		digest = hashlib.sha256()
+		for part in parts:
+			digest.update(str(part).encode('utf-8'))
+			digest.update(b'\0')
+		return digest.hexdigest()
+
+	def path(self, key):
+		return os.path.join(self.directory, key + self.SUFFIX)
+
+	# the stored entry for key, or None if there is none
+	def get(self, key):
+		try:
+			with open(self.path(key), 'rb') as infile:
+				data = infile.read()
+			os.utime(self.path(key))
+		except OSError:
+			return None
+		try:
+			return self.loads(data)
+		except ValueError:
+			# a damaged entry is as good as none
+			self.invalidate(key)
+			return None
+
+	def set(self, key, value):
+		data = self.dumps(value)
+		# written next to the entry and renamed over it, so readers never see
+		# half of a file
+		fd, tmp_name = tempfile.mkstemp(dir=self.directory)
+		try:
+			with os.fdopen(fd, 'wb') as outfile:
+				outfile.write(data)
+			os.replace(tmp_name, self.path(key))
+		except OSError:
+			if os.path.exists(tmp_name):
+				os.remove(tmp_name)
+			raise
+		self.evict()
+
+	# Remove the entry for key, or every entry if no key is given
+	def invalidate(self, key = None):
+		keys = [key] if key != None else [e[2] for e in self.entries()]
+		for k in keys:
+			try:
+				os.remove(self.path(k))
+			except OSError:
+				pass
+
+	# (mtime, size, key) of every entry
+	def entries(self):
+		entries = []
+		with os.scandir(self.directory) as it:
+			for entry in it:
+				if entry.name.endswith(self.SUFFIX):
+					try:
+						stat = entry.stat()
+					except OSError:
+						continue
+					entries.append((stat.st_mtime, stat.st_size, entry.name[:-len(self.SUFFIX)]))
+		return entries
+
+	def size(self):
+		return sum(e[1] for e in self.entries())
+
+	# remove the least recently used entries until the cache fits in max_size
+	def evict(self):
+		entries = sorted(self.entries())
+		total = sum(e[1] for e in entries)
+		for mtime, size, key in entries:
+			if total <= self.max_size:
+				break
+			self.invalidate(key)
+			total -= size
+
+	def dumps(self, value):
+		return json.dumps(value).encode('utf-8')
+
+	def loads(self, data):
+		return json.loads(data.decode('utf-8'))
+
+
+# Node positions keyed by the topology they were laid out for: the node
+# names with their class and bustype (layouts are rooted at SWING buses and
+# substations), the edges with their len, weight and class (the partition
+# layout cuts at transformers and regulators), and the layout parameters.
+# Any change to those gives a new key, so entries never go stale.
+class LayoutCache(DiskCache):
+
+	def layout_key(self, converter):
+		nodes = sorted('{} {} {}'.format(*[n['meta_props'].get(k) for k in ('name', 'obj_type', 'bustype')])
+			for n in converter.lists['nodes'])
+		edges = sorted('{} -- {} {} {} {} {}'.format(*[e['meta_props'].get(k) for k in ('from', 'to', 'len', 'length', 'weight', 'obj_type')])
+			for e in converter.lists['edges'] + converter.lists['dummy_edges'])
+		params = [converter.position_layout, converter.calc_geo_pos, sorted(converter.layout_options.items())]
+		if converter.calc_geo_pos:
+			# geographic positions depend on the coordinates too
+			params += [converter.geo_projection] + sorted('{} {} {}'.format(n['meta_props']['name'], *n.coordinates())
+				for n in converter.lists['nodes'])
+		return self.hash_key([len(nodes)] + nodes + [len(edges)] + edges + params)
+
+	# Set the positions of the converter's nodes from the cache, returns
+	# whether they were found
+	def load(self, converter, key = None):
+		positions = self.get(key or self.layout_key(converter))
+		if positions == None:
+			return False
+		for n in converter.lists['nodes']:
+			name = n['meta_props']['name']
+			if name in positions:
+				n['meta_props']['X_pos'], n['meta_props']['Y_pos'] = positions[name]
+		return True
+
+	# Store the positions the converter's nodes were laid out at
+	def store(self, converter, key = None):
+		positions = {}
+		for n in converter.lists['nodes']:
+			if 'X_pos' in n['meta_props'] and 'Y_pos' in n['meta_props']:
+				positions[n['meta_props']['name']] = [n['meta_props']['X_pos'], n['meta_props']['Y_pos']]
+		self.set(key or self.layout_key(converter), positions)
+
+
+class ParsePickler(pickle.Pickler):
+
+	def reducer_override(self, obj):
+		if isinstance(obj, GLMObject):
+			return obj.reduce(positions = False)
+		return NotImplemented
+
+
+# the sha256 of the source of the glm_parse package, see source_digest
+_source_digest = None
+
+
+# The sha256 of the .py files of the glm_parse package, computed once. Any
+# change to the classes that are pickled changes it
+def source_digest():
+	global _source_digest
+	if _source_digest == None:
+		package = os.path.dirname(os.path.abspath(__file__))
+		digest = hashlib.sha256()
+		for name in sorted(os.listdir(package)):
+			if name.endswith('.py'):
+				with open(os.path.join(package, name), 'rb') as infile:
+					digest.update(name.encode('utf-8') + b'\0' + infile.read() + b'\0')
+		_source_digest = digest.hexdigest()
+	return _source_digest
+
+
+# Parsed models keyed by the contents of every file they were parsed from:
+# the name and sha256 of each file reached through #include, in include
+# order, and the source of the parser itself. Editing any of them gives a
+# new key, so entries never go stale.
+# Entries are pickled, which loads far faster than parsing the GLM again.
+# Unpickling can run arbitrary code, so only use a cache directory that
+# nobody untrusted can write to.
+class ParseCache(DiskCache):
+	SUFFIX = '.parse'
+	# the state of a Converter that parsing fills in
+	STATE = ('lists', 'glm_lines', 'unknown_types', 'node_edges', 'name_index')
+
+	# preprocessor is the glm_preprocessor.GLMPreprocessor of the model,
+	# created with digest set
+	def parse_key(self, converter, preprocessor):
+		files = [(name, preprocessor.digests[name]) for name in preprocessor.file_names()]
+		params = [converter.VERSION, source_digest()]
+		return self.hash_key(params + [len(files)] + files)
+
+	# Set the parsed state of the converter from the cache, returns whether
+	# it was found
+	def load(self, converter, key):
+		state = self.get(key)
+		if state == None:
+			return False
+		for name in self.STATE:
+			setattr(converter, name, state[name])
+		# pickled without their positions, every node is to be placed
+		converter.unplaced = list(converter.lists['nodes'])
+		return True
+
+	def store(self, converter, key):
+		self.set(key, {name: getattr(converter, name) for name in self.STATE})
+
+	# Objects are pickled without their positions, which depend on the
+	# layout rather than the files (see GLMObject.reduce)
+	def dumps(self, value):
+		data = io.BytesIO()
+		ParsePickler(data, pickle.HIGHEST_PROTOCOL).dump(value)
+		return data.getvalue()
+
+	# Entries pickled by an older version of the classes are as good as
+	# none. The garbage collector is paused while the objects are created,
+	# it would otherwise scan them over and over
+	def loads(self, data):
+		enabled = gc.isenabled()
+		gc.disable()
+		try:
+			return pickle.loads(data)
+		except Exception as e:
+			raise ValueError(e)
+		finally:
+			if enabled:
+				gc.enable()
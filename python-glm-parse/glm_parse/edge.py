@@ -3,6 +3,8 @@
 # care to have in our graph.	For the most part they just override #dot_props to
 # provide a different visual rendering for different types of edges.
 
+from types import MappingProxyType
+
 from glm_parse.glm_object import GLMObject
 
 # base class for all GLMObjects that are treated as edges
@@ -27,7 +29,8 @@ class Edge(GLMObject):
 		e['meta_props']['dummy'] = True
 		return e
 	
-	def dot_props(self):
+	# the length of the edge, the rest of its style is the class STYLE
+	def base_dot_props(self):
 		if('len' in self['meta_props'].keys()):
 			p = {"len":str(max([self['meta_props']['len'], self.MIN_LEN]))}
 			if('weight' in self['meta_props'].keys()):
@@ -41,67 +44,42 @@ class Edge(GLMObject):
 			return {"len": str(max([str(float(self['meta_props']['length']) * self.LEN_SCALE), self.MIN_LEN])),
 							"weight": self.WEIGHT_FOR_SPECIFIED }
 	
-	# The line of DOT code defined by an Edge
-	def to_dot(self):
-		s = "{fromVal} -- {toVal} [".format(
+	# The DOT attributes of an Edge as (key, value) pairs
+	def dot_attrs(self):
+		return list(self.cached_dot_props().items())
+
+	# The DOT statement head of an Edge, "from -- to"
+	def dot_head(self):
+		return "{fromVal} -- {toVal}".format(
 			fromVal = self.clean_dot_name(self['meta_props']['from']),
 			toVal = self.clean_dot_name(self['meta_props']['to'])
 		)
-		for k, v in self.dot_props().items():
-			s += "{key}=\"{val}\", ".format(key = k, val = v)
-		return s.strip(', ') + '];'
+
+	# The line of DOT code defined by an Edge, with only the attributes that
+	# aren't in defaults
+	def to_dot(self, defaults = None):
+		return self.dot_line(self.dot_head(), self.dot_attrs(), defaults)
 
 class Regulator(Edge):
-	def dot_props(self):
-		color = '1:8:1'
-		penwidth = '3'
-		
-		return { **super().dot_props(), **{'color': color, 'penwidth': penwidth} }
+	STYLE = MappingProxyType({'color': '1:8:1', 'penwidth': '3'})
 
 class Fuse(Edge):
-	def dot_props(self):
-		color = '6'
-		penwidth = '5'
-
-		return { **super().dot_props(), **{'color': color, 'penwidth': penwidth} }
+	STYLE = MappingProxyType({'color': '6', 'penwidth': '5'})
 
 class OverheadLine(Edge):
-	def dot_props(self):
-		color = '5'
-		penwidth = '2'
-
-		return { **super().dot_props(), **{'color': color, 'penwidth': penwidth} }
+	STYLE = MappingProxyType({'color': '5', 'penwidth': '2'})
 
 class Recloser(Edge):
-	def dot_props(self):
-		color = '6:8:6'
-		penwidth = '3'
-		
-		return { **super().dot_props(), **{'color': color, 'penwidth': penwidth} }
+	STYLE = MappingProxyType({'color': '6:8:6', 'penwidth': '3'})
 
 class Switch(Edge):
-	def dot_props(self):
-		color = '4'
-		penwidth = '5'
-		
-		return { **super().dot_props(), **{'color': color, 'penwidth': penwidth} }
+	STYLE = MappingProxyType({'color': '4', 'penwidth': '5'})
 
 class Transformer(Edge):
-	def dot_props(self):
-		color = '1'
-		penwidth = '5'
-		
-		return { **super().dot_props(), **{'color': color, 'penwidth': penwidth} }
+	STYLE = MappingProxyType({'color': '1', 'penwidth': '5'})
 
 class TriplexLine(Edge):
-	def dot_props(self):
-		color = '8'
-		
-		return { **super().dot_props(), **{'color': color} }
+	STYLE = MappingProxyType({'color': '8'})
 
 class UndergroundLine(Edge):
-	def dot_props(self):
-		color = '7'
-		penwidth = '2'
-		
-		return { **super().dot_props(), **{'color': color, 'penwidth': penwidth} }
\ No newline at end of file
+	STYLE = MappingProxyType({'color': '7', 'penwidth': '2'})
\ No newline at end of file
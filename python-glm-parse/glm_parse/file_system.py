@@ -0,0 +1,127 @@
+import io
+import mmap
+import os
+
+# Where a Converter reads and writes its files.
+# Relative file names are resolved against base_dir instead of the process
+# working directory, so several converters can work on models in different
+# directories at the same time (e.g. in the threads of a server) without
+# calling os.chdir.
+class FileSystem:
+
+	def __init__(self, base_dir = None):
+		self.base_dir = base_dir
+
+	def path(self, name):
+		if self.base_dir == None or os.path.isabs(name):
+			return name
+		return os.path.join(self.base_dir, name)
+
+	def isfile(self, name):
+		return os.path.isfile(self.path(name))
+
+	def open(self, name, mode = 'r'):
+		return open(self.path(name), mode)
+
+	def read_text(self, name):
+		with self.open(name, 'r') as infile:
+			return infile.read()
+
+	# A FileReader of the file, see below
+	def reader(self, name):
+		return FileReader(self, name)
+
+	# The contents of a file as a read only buffer, mapped into memory rather
+	# than read so only the pages that are used take up memory. Close it
+	# when done, an open map keeps the file locked on Windows
+	def mmap(self, name):
+		with open(self.path(name), 'rb') as infile:
+			if os.fstat(infile.fileno()).st_size == 0:
+				return b''
+			return mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+
+	def makedirs(self, name):
+		os.makedirs(self.path(name), exist_ok=True)
+
+
+# Files kept in a dict of file name to text, e.g. for models that were
+# uploaded and never written to disk. Files written are added to the dict.
+class MemoryFileSystem(FileSystem):
+
+	def __init__(self, files = None, base_dir = None):
+		super().__init__(base_dir)
+		self.files = {}
+		for name, text in (files or {}).items():
+			self.files[self.path(name)] = text
+
+	def path(self, name):
+		return os.path.normpath(super().path(name))
+
+	def isfile(self, name):
+		return self.path(name) in self.files
+
+	def open(self, name, mode = 'r'):
+		path = self.path(name)
+		if 'r' in mode:
+			if path not in self.files:
+				raise FileNotFoundError(path)
+			if 'b' in mode:
+				return io.BytesIO(self.files[path].encode('utf-8'))
+			return io.StringIO(self.files[path])
+		return MemoryFile(self.files, path)
+
+	# the text is in memory already, as bytes so offsets are the same as in
+	# a file
+	def mmap(self, name):
+		return self.read_text(name).encode('utf-8')
+
+	def makedirs(self, name):
+		pass
+
+
+# Reads spans of a file on demand, e.g. the bodies of lazy objects, like
+# reader[start:end] for the bytes from start to end, without keeping the
+# file open. While it is entered (with reader:) the file is mapped into buf
+# and spans are read from the map, e.g. while the file is tokenized.
+class FileReader:
+	__slots__ = ('file_system', 'name', 'buf', 'depth')
+
+	def __init__(self, file_system, name):
+		self.file_system = file_system
+		self.name = name
+		self.buf = None
+		self.depth = 0
+
+	def __getitem__(self, span):
+		if self.buf != None:
+			return self.buf[span]
+		with self.file_system.open(self.name, 'rb') as infile:
+			infile.seek(span.start)
+			return infile.read(span.stop - span.start)
+
+	def __enter__(self):
+		if self.depth == 0:
+			self.buf = self.file_system.mmap(self.name)
+		self.depth += 1
+		return self
+
+	def __exit__(self, *exc):
+		self.depth -= 1
+		if self.depth == 0:
+			if hasattr(self.buf, 'close'):
+				self.buf.close()
+			self.buf = None
+
+
+# A file being written to a MemoryFileSystem, stored when it is closed
+class MemoryFile(io.StringIO):
+
+	def __init__(self, files, path):
+		super().__init__()
+		self.files = files
+		self.path = path
+
+	def close(self):
+		if not self.closed:
+			self.files[self.path] = self.getvalue()
+		super().close()
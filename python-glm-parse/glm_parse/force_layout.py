@@ -0,0 +1,196 @@
+import time
+
+import numpy as np
+
+# In-process force directed layout.
+# Edges pull their nodes together like springs with the edge's own length and
+# weight, every pair of nodes pushes apart. The pairwise repulsion is
+# approximated with a Barnes-Hut style quadtree: the layout is covered with
+# grids of 2x2, 4x4, ... cells, and each cell is pushed by the centers of mass
+# of the cells of the same size that are too far away to be in the next finer
+# grid's neighbourhood. Only nodes in neighbouring cells of the finest grid
+# push each other directly. Everything is computed on whole grids at once
+# with numpy, so one iteration costs O(n) no matter how the nodes are spread.
+
+# average number of nodes per cell in the finest grid
+NODES_PER_CELL = 8
+MAX_LEVEL = 9
+# width of the border grids are padded with, so shifted grids are just views
+PAD = 3
+
+# offsets to the cells a cell interacts with at each level: the children of
+# its parent's neighbours that aren't its own neighbours. Which ones depend on
+# whether the cell is the first (even) or second (odd) child along each axis.
+_FAR_OFFSETS = [(dx, dy) for dx in range(-3, 4) for dy in range(-3, 4) if abs(dx) > 1 or abs(dy) > 1]
+_NEAR_OFFSETS = [(dx, dy) for dx in range(-1, 2) for dy in range(-1, 2) if dx or dy]
+
+
+def _padded(grid):
+	return np.pad(grid, PAD)
+
+
+def _view(padded, dx, dy, size):
+	# padded grid shifted so that [i, j] is the cell [i + dx, j + dy]
+	return padded[PAD + dx:PAD + dx + size, PAD + dy:PAD + dy + size]
+
+
+def _parity_mask(size, dx, dy):
+	# cells that can see the offset: +3 only from even cells, -3 only from odd
+	def axis(d):
+		index = np.arange(size)
+		if d == 3:
+			return index % 2 == 0
+		if d == -3:
+			return index % 2 == 1
+		return np.ones(size, dtype=bool)
+	return np.outer(axis(dx), axis(dy))
+
+
+# Repulsion on every node, strength / distance from every other node
+def repulsion(x, y, strength):
+	n = len(x)
+	fx = np.zeros(n)
+	fy = np.zeros(n)
+	if n < 2:
+		return fx, fy
+
+	# fit the layout in the unit square
+	x_0, y_0 = x.min(), y.min()
+	extent = max(x.max() - x_0, y.max() - y_0) * (1 + 1e-9) or 1.0
+	levels = int(min(MAX_LEVEL, max(2, np.ceil(np.log(n / NODES_PER_CELL) / np.log(4)))))
+	size = 2 ** levels
+	ix = np.minimum(((x - x_0) * (size / extent)).astype(np.int64), size - 1)
+	iy = np.minimum(((y - y_0) * (size / extent)).astype(np.int64), size - 1)
+
+	# mass and summed positions of the finest grid, then of each coarser grid
+	cell = ix * size + iy
+	grids = [(
+		np.bincount(cell, minlength=size * size).reshape(size, size).astype(float),
+		np.bincount(cell, weights=x, minlength=size * size).reshape(size, size),
+		np.bincount(cell, weights=y, minlength=size * size).reshape(size, size),
+	)]
+	while len(grids) < levels - 1:
+		half = grids[-1][0].shape[0] // 2
+		grids.append(tuple(g.reshape(half, 2, half, 2).sum(axis=(1, 3)) for g in grids[-1]))
+	grids.reverse()
+
+	field_x = np.zeros((2, 2))
+	field_y = np.zeros((2, 2))
+	for mass, sum_x, sum_y in grids:
+		level_size = mass.shape[0]
+		occupied = mass > 0
+		cx = sum_x / np.maximum(mass, 1)
+		cy = sum_y / np.maximum(mass, 1)
+
+		# forces from the coarser levels apply to all four children
+		field_x = np.repeat(np.repeat(field_x, 2, axis=0), 2, axis=1)
+		field_y = np.repeat(np.repeat(field_y, 2, axis=0), 2, axis=1)
+
+		padded_mass, padded_x, padded_y = _padded(mass), _padded(cx), _padded(cy)
+		for dx, dy in _FAR_OFFSETS:
+			if abs(dx) >= level_size or abs(dy) >= level_size:
+				continue
+			ddx = cx - _view(padded_x, dx, dy, level_size)
+			ddy = cy - _view(padded_y, dx, dy, level_size)
+			scale = _view(padded_mass, dx, dy, level_size) / np.maximum(ddx * ddx + ddy * ddy, 1e-12)
+			if abs(dx) == 3 or abs(dy) == 3:
+				scale *= _parity_mask(level_size, dx, dy)
+			field_x += ddx * scale
+			field_y += ddy * scale
+
+		field_x *= occupied
+		field_y *= occupied
+
+	fx += field_x[ix, iy]
+	fy += field_y[ix, iy]
+
+	# the nearest nodes push each node from the centers of mass of its own
+	# cell (without the node itself) and the neighbouring cells
+	mass, sum_x, sum_y = grids[-1]
+	others = mass[ix, iy] - 1
+	has_others = others > 0
+	ddx = np.where(has_others, x - (sum_x[ix, iy] - x) / np.maximum(others, 1), 0)
+	ddy = np.where(has_others, y - (sum_y[ix, iy] - y) / np.maximum(others, 1), 0)
+	dist2 = ddx * ddx + ddy * ddy
+	# nodes right on top of each other are pushed apart in a random direction
+	stacked = has_others & (dist2 < (1e-6 * extent) ** 2)
+	if stacked.any():
+		angle = np.random.default_rng(n).uniform(0, 2 * np.pi, stacked.sum())
+		ddx[stacked] = np.cos(angle) * 1e-3 * extent
+		ddy[stacked] = np.sin(angle) * 1e-3 * extent
+		dist2[stacked] = (1e-3 * extent) ** 2
+	scale = others / np.maximum(dist2, 1e-12)
+	fx += ddx * scale
+	fy += ddy * scale
+
+	padded_mass, padded_x, padded_y = _padded(mass), _padded(sum_x / np.maximum(mass, 1)), _padded(sum_y / np.maximum(mass, 1))
+	for dx, dy in _NEAR_OFFSETS:
+		jx = ix + (PAD + dx)
+		jy = iy + (PAD + dy)
+		ddx = x - padded_x[jx, jy]
+		ddy = y - padded_y[jx, jy]
+		scale = padded_mass[jx, jy] / np.maximum(ddx * ddx + ddy * ddy, 1e-12)
+		fx += ddx * scale
+		fy += ddy * scale
+
+	return fx * strength, fy * strength
+
+
+# Spring forces along the edges, pulling towards each edge's rest length
+def attraction(x, y, src, dst, length, weight):
+	ddx = x[dst] - x[src]
+	ddy = y[dst] - y[src]
+	dist = np.maximum(np.sqrt(ddx * ddx + ddy * ddy), 1e-9)
+	scale = weight * dist / length
+	fx = ddx * scale
+	fy = ddy * scale
+	n = len(x)
+	return np.bincount(src, weights=fx, minlength=n) - np.bincount(dst, weights=fx, minlength=n), np.bincount(src, weights=fy, minlength=n) - np.bincount(dst, weights=fy, minlength=n)
+
+
+# Lay out n nodes connected by the edges src[i] -- dst[i] with rest lengths
+# length[i] and weights weight[i]. Starts from x, y if given, otherwise from
+# random positions. Stops after max_iter iterations, after time_budget
+# seconds or once nodes move less than tol * the typical edge length.
+def force_layout(n, src, dst, length, weight, x = None, y = None, max_iter = 100, time_budget = None, seed = 0, tol = 0.01):
+	start = time.perf_counter()
+	src = np.asarray(src, dtype=np.int64)
+	dst = np.asarray(dst, dtype=np.int64)
+	length = np.asarray(length, dtype=float)
+	weight = np.asarray(weight, dtype=float)
+
+	k = float(np.median(length)) if len(length) else 1.0
+	side = k * np.sqrt(max(n, 1))
+	if x is None or y is None:
+		rng = np.random.default_rng(seed)
+		x = rng.uniform(0, side, n)
+		y = rng.uniform(0, side, n)
+	else:
+		x = np.array(x, dtype=float)
+		y = np.array(y, dtype=float)
+
+	if n < 2:
+		return x, y
+
+	# the largest step a node can take, cooled down every iteration
+	temperature = side / 10
+	cooling = (k * tol / temperature) ** (1.0 / max(max_iter, 1))
+
+	for _ in range(max_iter):
+		fx, fy = repulsion(x, y, k * k)
+		ax, ay = attraction(x, y, src, dst, length, weight)
+		fx += ax
+		fy += ay
+
+		force = np.maximum(np.sqrt(fx * fx + fy * fy), 1e-12)
+		step = np.minimum(force, temperature) / force
+		x += fx * step
+		y += fy * step
+
+		temperature *= cooling
+		if temperature < k * tol:
+			break
+		if time_budget != None and time.perf_counter() - start > time_budget:
+			break
+
+	return x, y
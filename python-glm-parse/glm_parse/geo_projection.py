@@ -0,0 +1,89 @@
+import math
+import re
+
+import numpy as np
+
+# Projections from latitude/longitude (in radians) to planar x/y in meters.
+# Each takes numpy arrays of latitudes and longitudes and projects them in bulk.
+
+#earths radius in m
+EARTH_RADIUS = 6367000.0
+# sphere used by Web Mercator (EPSG:3857)
+WEB_MERCATOR_RADIUS = 6378137.0
+# WGS84 ellipsoid, used for the local tangent plane
+WGS84_A = 6378137.0
+WGS84_E2 = 6.69437999014e-3
+
+# GridLAB-D writes coordinates either as decimal degrees or like "46N12:34.5"
+# (degrees, hemisphere, minutes and optional seconds)
+DMS_COORDINATE = re.compile(r'^\s*(\d+(?:\.\d*)?)\s*([NSEW])\s*(\d+(?:\.\d*)?)?(?::(\d+(?:\.\d*)?))?\s*$', re.I)
+
+
+# Return the coordinate in decimal degrees, or None if it can't be read
+def parse_coordinate(value):
+	if value == None:
+		return None
+	try:
+		return float(value)
+	except ValueError:
+		pass
+
+	match = DMS_COORDINATE.match(str(value).strip('"'))
+	if not match:
+		return None
+	degrees, hemisphere, minutes, seconds = match.groups()
+	coordinate = float(degrees) + float(minutes or 0) / 60 + float(seconds or 0) / 3600
+	return -coordinate if hemisphere.upper() in 'SW' else coordinate
+
+
+#This stack overflow link is useful for understanding the projection method:
+#https://stackoverflow.com/questions/16266809/convert-from-latitude-longitude-to-x-y
+def equirectangular(lat, lng):
+	#phi_0 should be set to mid lat-point of your map
+	phi_0 = (lat.max() + lat.min()) / 2
+	return lng * math.cos(phi_0) * EARTH_RADIUS, lat * EARTH_RADIUS
+
+
+def web_mercator(lat, lng):
+	return lng * WEB_MERCATOR_RADIUS, np.log(np.tan(np.pi / 4 + lat / 2)) * WEB_MERCATOR_RADIUS
+
+
+# East/north offsets from the middle of the map on a plane tangent to the
+# WGS84 ellipsoid, which keeps distances accurate for feeder sized areas
+# the way a UTM zone does
+def local_tangent_plane(lat, lng):
+	lat_0 = (lat.max() + lat.min()) / 2
+	lng_0 = (lng.max() + lng.min()) / 2
+
+	def ecef(phi, lam):
+		n = WGS84_A / np.sqrt(1 - WGS84_E2 * np.sin(phi) ** 2)
+		return n * np.cos(phi) * np.cos(lam), n * np.cos(phi) * np.sin(lam), n * (1 - WGS84_E2) * np.sin(phi)
+
+	x, y, z = ecef(lat, lng)
+	x_0, y_0, z_0 = ecef(np.float64(lat_0), np.float64(lng_0))
+	dx, dy, dz = x - x_0, y - y_0, z - z_0
+
+	east = -math.sin(lng_0) * dx + math.cos(lng_0) * dy
+	north = -math.sin(lat_0) * math.cos(lng_0) * dx - math.sin(lat_0) * math.sin(lng_0) * dy + math.cos(lat_0) * dz
+	return east, north
+
+
+PROJECTIONS = {
+	'equirectangular': equirectangular,
+	'mercator': web_mercator,
+	'local': local_tangent_plane,
+}
+
+
+# Add a projection that can be selected with Converter(geo_projection=name).
+# projection(lat, lng) gets numpy arrays in radians and returns x, y in meters
+def register_projection(name, projection):
+	PROJECTIONS[name] = projection
+
+
+# Project latitudes and longitudes in degrees to x, y in meters
+def project(lat, lng, projection = 'equirectangular'):
+	if projection not in PROJECTIONS:
+		raise ValueError("Unknown projection {}, expected one of {}".format(projection, ', '.join(PROJECTIONS.keys())))
+
+	return PROJECTIONS[projection](np.radians(np.asarray(lat, dtype=float)), np.radians(np.asarray(lng, dtype=float)))
@@ -1,4 +1,6 @@
-from glm_parse.glm_string import GLMString
+from glm_parse.glm_tokenizer import parse_object_body, split_lines, source_text
+from glm_parse.tracked_dict import TrackedDict
+from types import MappingProxyType
 
 # base class for any object we care about in a .glm file
 # GLMObject basically just parses lines from the input file into
@@ -7,52 +9,193 @@ from glm_parse.glm_string import GLMString
 # that generates a hash of the DOT properties for the object and a
 # #to_dot method that returns the entire DOT file line for the object
 
+# the resolved class_style of every class
+_class_styles = {}
+
+# An object of klass with the items, for unpickling (see GLMObject.__reduce__)
+def restore_object(klass, items):
+	obj = klass.__new__(klass)
+	obj.source = None
+	obj.dot_cache = None
+	dict.update(obj, items)
+	return obj
+
+# What the props of an object are now: TrackedDicts count their changes
+def props_version(props):
+	return (props, getattr(props, 'changes', None))
+
 class GLMObject(dict):
-	def __init__(self, lines=None,obj_dict=None, tweak = False):
-		if(lines != None):
+	META_PROP_NAMES = ['name', 'to', 'from', 'parent', 'len', 'length', 'weight', 'bustype']
+	# meta props set by the layout, and by dot_props when there is none
+	LAYOUT_PROPS = ('X_pos', 'Y_pos')
+	# DOT props every object of a class has, on top of those of the classes
+	# it inherits from (see class_style)
+	STYLE = MappingProxyType({})
+	# slots rather than attributes, so objects don't need an instance dict
+	__slots__ = ('source', 'dot_cache')
+
+	def __init__(self, lines=None,obj_dict=None, tweak = False, props=None, comments=None, line_number=None, id=None, obj_type=None, file_name=None, source=None, raw_props=None):
+		# (buf, start, end) of the body of a lazy object in its file, see
+		# glm_tokenizer.tokenize_spans
+		self.source = None
+		# (props versions, dot_props) the last time dot_props was computed,
+		# see cached_dot_props
+		self.dot_cache = None
+		if(props != None):
+			# stored directly rather than through __setitem__, there is no
+			# cache to drop yet. A lazy object's props are dropped below
+			dict.__setitem__(self, 'glm_props', props if source != None or type(props) != dict else TrackedDict(props))
+			dict.__setitem__(self, 'comments', comments if comments != None else {})
+			# [written, expanded] values of the props that had macros in them,
+			# see glm_preprocessor.GLMPreprocessor.parse_object
+			if(raw_props):
+				self['raw_props'] = raw_props
+		elif(lines != None):
 			self.from_glm(lines,tweak)
 		elif(obj_dict != None):
 			self.from_json(obj_dict)
 		#initialize meta props
-		self.set_meta_props()
+		self.set_meta_props(line_number, id, obj_type, file_name)
+		# a lazy object only keeps its meta props, the rest of the body is
+		# decoded again from the file the first time it is used
+		if(source != None):
+			self.source = source
+			del self['glm_props']
+			del self['comments']
 
+	def __missing__(self, key):
+		if(self.source != None and key in ('glm_props', 'comments')):
+			self['glm_props'], self['comments'] = self.parsed_body()
+			self.source = None
+			return self[key]
+		raise KeyError(key)
 
-	def from_glm(self,lines,tweak = False):
-		self['glm_props'] = {}
-		self['comments'] = {}
-		in_nested = False
-		for line_num,line in enumerate(lines):
-			a_prop2value = line.strip(' ;').split() if line != None else []
-			
-			if len(a_prop2value) > 1 and a_prop2value[0][:2] != '//' and not in_nested:
-				
-				#deal with spaces after initial space eg: 	floor_height 10 ft;
-				a_prop2value = [a_prop2value[0], ' '.join(a_prop2value[1:])]
-
-				prop_name = a_prop2value[0]
-				# prop_val should be a GLM String for tweaking values
-				prop_val = GLMString(a_prop2value[1]) if len(a_prop2value) > 1 else GLMString("")
-				
-				# for some properties, we want to "tweak" the value from what's in
-				# the file. If we define a method with the right name (like tweak_name)
-				# then it will be called to modify the property's value before continuing
-				tweak_method = "tweak_" + prop_name
-			
-				if(prop_name == 'object'):
-					in_nested = True
-					self['comments'][line_num+1] = line
-
-					#enter nested object, all props will be comments
-					#print("found nested object")
-					#break
-				else:
-					self['glm_props'][prop_name] = prop_val.strip(';')
+	# Pickled as the class and its items. A lazy object is pickled with its
+	# body decoded, the file it points into can't be pickled
+	def __reduce__(self):
+		return self.reduce()
 
-			else:
-				if(line == '}' or line == '};'):
-					in_nested = False
-				#line_num + 1 because the first line of the object is the declaration
-				self['comments'][line_num+1] = line
+	# __reduce__, without the LAYOUT_PROPS in meta_props unless positions is
+	# set, so the object is pickled as it was parsed (see
+	# disk_cache.ParseCache)
+	def reduce(self, positions = True):
+		items = dict(self)
+		meta_props = items['meta_props']
+		if(not positions and any(key in meta_props for key in self.LAYOUT_PROPS)):
+			meta_props = meta_props.copy()
+			for key in self.LAYOUT_PROPS:
+				meta_props.pop(key, None)
+			items['meta_props'] = meta_props
+		if(self.source != None):
+			glm_props, comments = self.parsed_body()
+			items['glm_props'], items['comments'] = glm_props, comments
+		return (restore_object, (type(self), items))
+
+	# The props are kept in TrackedDicts, so editing them in place is noticed
+	# just like replacing them (see dot_version)
+	def __setitem__(self, key, value):
+		if(key == 'glm_props' or key == 'meta_props'):
+			self.dot_cache = None
+			if(type(value) == dict):
+				value = TrackedDict(value)
+		super().__setitem__(key, value)
+
+	# The STYLE templates of the class and the classes it inherits from
+	# merged, base classes first, resolved once per class
+	@classmethod
+	def class_style(cls):
+		style = _class_styles.get(cls)
+		if(style == None):
+			merged = {}
+			for klass in reversed(cls.__mro__):
+				merged.update(klass.__dict__.get('STYLE', {}))
+			style = _class_styles[cls] = MappingProxyType(merged)
+		return style
+
+	# The DOT props of the object: its base_dot_props, then the class style,
+	# then the parts of the style that depend on the object. variable is
+	# the variable_style when it was computed already (see variable_styles)
+	def dot_props(self, variable = None):
+		p = self.base_dot_props()
+		p.update(self.class_style())
+		p.update(self.variable_style() if variable == None else variable)
+		return p
+
+	def base_dot_props(self):
+		return {}
+
+	# the DOT props that differ between objects of the same class
+	def variable_style(self):
+		return {}
+
+	# variable_style of each of objs, all of the class, in one pass
+	@classmethod
+	def variable_styles(cls, objs):
+		return [obj.variable_style() for obj in objs]
+
+	# Cache the DOT props of objs, all of the class, with the variable parts
+	# computed in one pass. Classes that still override dot_props itself
+	# are done one object at a time
+	@classmethod
+	def cache_styles(cls, objs):
+		if(cls.dot_props is not GLMObject.dot_props):
+			for obj in objs:
+				obj.cached_dot_props()
+			return
+		for obj, variable in zip(objs, cls.variable_styles(objs)):
+			obj.cache_dot_props(obj.dot_props(variable))
+
+	# dot_props, computed once and kept until the meta props or glm props of
+	# the object are changed (in place or replaced), the position among them.
+	# The dict is shared, so it must not be modified.
+	def cached_dot_props(self):
+		if(not self.has_dot_cache()):
+			self.cache_dot_props(self.dot_props())
+		return self.dot_cache[1]
+
+	def cache_dot_props(self, dot_props):
+		# after dot_props, which fills in a default position
+		self.dot_cache = (self.dot_version(), dot_props)
+
+	def has_dot_cache(self):
+		return self.dot_cache != None and self.dot_cache[0] == self.dot_version()
+
+	# the props_version of the props the DOT props are computed from. The
+	# glm props of a lazy object are where its body is, until it is decoded
+	def dot_version(self):
+		glm_props = dict.get(self, 'glm_props')
+		return (props_version(self['meta_props']), self.source if glm_props == None else props_version(glm_props))
+
+	def invalidate(self):
+		self.dot_cache = None
+
+	# (glm_props, comments) of the object. A lazy object's are decoded from
+	# its file without keeping them, for reading through every object once
+	def parsed_body(self):
+		if(self.source != None):
+			return parse_object_body(split_lines(source_text(self.source)))
+		return self['glm_props'], self.get('comments')
+
+
+	# (latitude, longitude) as written, None where they aren't. Read without
+	# decoding a lazy object for good, layouts go through every node
+	def coordinates(self):
+		glm_props = dict.get(self, 'glm_props')
+		if(glm_props == None):
+			glm_props = self.parsed_body()[0]
+		return glm_props.get('latitude'), glm_props.get('longitude')
+
+	# whether the object has a position of its own, from the layout or moved
+	# by hand. The "0.0", "0.0" Node.base_dot_props writes for nodes without
+	# one isn't one
+	def positioned(self):
+		meta_props = self['meta_props']
+		if 'X_pos' not in meta_props or 'Y_pos' not in meta_props:
+			return False
+		return meta_props['X_pos'] != "0.0" or meta_props['Y_pos'] != "0.0"
+
+	def from_glm(self,lines,tweak = False):
+		self['glm_props'], self['comments'] = parse_object_body(lines)
 
 
 	def from_json(self, obj_dict):
@@ -64,57 +207,94 @@ class GLMObject(dict):
 
 
 	def set_meta_props(self, line_number=None, id=None, obj_type=None, file_name=None):
-		if('meta_props' not in self.keys()):
-			self['meta_props'] = {}
+		# new meta props are filled in as a plain dict, and tracked once they
+		# are complete (see __setitem__)
+		meta_props = self.get('meta_props')
+		created = meta_props == None
+		if(created):
+			meta_props = {}
 
 		#This is called after the object has been created in glm_parse
 		#Check if properties are already set, if not initialize them
-		if(line_number != None or 'line_number' not in self['meta_props'].keys()):
-			self['meta_props']['line_number'] = line_number
+		if(line_number != None or 'line_number' not in meta_props):
+			meta_props['line_number'] = line_number
 		
-		if(id != None or 'id' not in self['meta_props'].keys()):
-			self['meta_props']['id'] = id
+		if(id != None or 'id' not in meta_props):
+			meta_props['id'] = id
 		
-		if(obj_type != None or 'obj_type' not in self['meta_props'].keys()):
-			self['meta_props']['obj_type'] = obj_type
-
-		if(file_name != None or 'file_name' not in self['meta_props'].keys()):
-			self['meta_props']['file_name'] = file_name
+		if(obj_type != None or 'obj_type' not in meta_props):
+			meta_props['obj_type'] = obj_type
 
+		if(file_name != None or 'file_name' not in meta_props):
+			meta_props['file_name'] = file_name
 
-		meta_prop_names = ['name', 'to', 'from', 'parent', 'len', 'length', 'weight', 'bustype']
 
-		for prop in meta_prop_names:
-			if('glm_props' in self.keys() and prop in self['glm_props'].keys()):
-				#handle in line comments in such as name node:1; //this is node1	
-				self['meta_props'][prop] = self['glm_props'][prop].split(";")[0]
+		glm_props = self.get('glm_props')
+		if(glm_props):
+			for prop in self.META_PROP_NAMES:
+				if(prop in glm_props):
+					#handle in line comments in such as name node:1; //this is node1	
+					meta_props[prop] = glm_props[prop].split(";")[0]
 		
 		#name is mandatory
-		if('name' not in self['meta_props']):
-			self['meta_props']['name'] = 'NO_NAME_FOUND'
+		if('name' not in meta_props):
+			meta_props['name'] = 'NO_NAME_FOUND'
+
+		if(created):
+			dict.__setitem__(self, 'meta_props', TrackedDict(meta_props))
 
 
 	# The line of JSON defined by the glm object
 	def to_json(self):
 		d = {}
-		dot_props = self.dot_props()
+		dot_props = self.cached_dot_props()
+		glm_props, comments = self.parsed_body()
 		d["dot_props"] = dot_props
-		d["glm_props"] = self['glm_props']
+		d["glm_props"] = glm_props
 		d["meta_props"] = self['meta_props']
-		d["comments"] = self['comments']
+		d["comments"] = comments
+		if('raw_props' in self):
+			d["raw_props"] = self['raw_props']
 		return d
 
+	# A DOT statement like: head [key="value", ...];
+	# attributes that are in defaults with the same value are left out
+	@staticmethod
+	def dot_line(head, attrs, defaults = None):
+		if defaults:
+			attrs = [(k, v) for k, v in attrs if defaults.get(k, None) != v]
+			if not attrs:
+				return head + ';'
+		s = head + ' ['
+		for k, v in attrs:
+			s += "{k}=\"{v}\", ".format(k = k, v = v)
+		return s.strip(', ') + '];'
+
 	def to_glm(self):
 		start = "object " +str(self['meta_props']['id'])
 		s = [start +' {\n']
-		for k, v in self['glm_props'].items():
-			if v != None:
-				# TODO: handle values (v) that have double quotes in them already
-				s.append("\t{} {};\n".format(k, v))
-
-		if('comments' in self.keys()):
-			for line_num in self['comments'].keys():
-				s.insert(int(line_num), self['comments'][line_num])
+		glm_props, comments = self.parsed_body()
+		# props with macros are written with the macros, unless they were
+		# changed since
+		raw_props = self.get('raw_props') or {}
+		props = []
+		for k, v in glm_props.items():
+			if(v != None):
+				if(k in raw_props and raw_props[k][1] == v):
+					v = raw_props[k][0]
+				props.append("\t{} {};\n".format(k, v))
+		# TODO: handle values (v) that have double quotes in them already
+
+		# comments go back on the line they were found on, props fill the
+		# lines in between
+		comments = comments or {}
+		p = 0
+		for line_num, comment in sorted((int(k), c) for k, c in comments.items()):
+			take = max(0, min(line_num - len(s), len(props) - p))
+			s += props[p:p + take]
+			p += take
+			s.append(comment)
+		s += props[p:]
 		s.append('}')
 		return ''.join(s)
 
@@ -0,0 +1,280 @@
+import os
+import re
+import hashlib
+import operator
+from concurrent.futures import ProcessPoolExecutor
+
+from glm_parse.file_system import FileSystem
+from glm_parse.glm_tokenizer import tokenize_glm, tokenize_spans, parse_glm_text, parse_object_body, shard_ranges, split_lines, GLM_LINE, GLM_OBJECT, GLM_PARSED, GLM_SPAN
+
+# GLM preprocessor.
+# Reads a .glm file and everything it #includes, each file exactly once, and
+# hands the parser a single stream of tokens that know the file and line
+# they came from:
+#	(GLM_LINE, file_name, line_number, line, active)
+#	(GLM_OBJECT, file_name, obj_type, index, body_lines, line_number)
+# or, with the object bodies already parsed (see parallel_tokens)
+#	(GLM_PARSED, file_name, obj_type, index, props, comments, line_number)
+# and objects of files with directives or macros, whose bodies are parsed
+# against the lines as written (see parse_object)
+#	(GLM_PARSED, file_name, obj_type, index, props, comments, line_number, raw_props)
+# or, with just where their bodies are (see span_tokens)
+#	(GLM_SPAN, file_name, obj_type, index, (buf, start, end), line_number)
+# Lines outside of objects, directives and lines in excluded #if blocks
+# are all kept as GLM_LINE tokens (with active False when excluded) so the
+# files can be written back out unchanged. Object bodies have ${NAME}
+# macros expanded for their props, and keep what was written as well.
+
+# a line starting with # is a directive, like "#include "file.glm";"
+DIRECTIVE = re.compile(r'^\s*#\s*(\w+)\s*(.*?)\s*$')
+DIRECTIVE_LINE = re.compile(r'^[^\S\n]*#', re.M)
+MACRO = re.compile(r'\$\{(\w+)\}')
+# the comparison of an #if, like "${VOLTAGE}==7200" or "VOLTAGE != 7200"
+CONDITION = re.compile(r'^(.*?)\s*(==|!=|<=|>=|<|>)\s*(.*)$')
+COMPARISONS = {'==': operator.eq, '!=': operator.ne, '<=': operator.le, '>=': operator.ge, '<': operator.lt, '>': operator.gt}
+
+# files parsed in parallel are split into shards of at least this many
+# characters, up to this many shards per worker
+MIN_SHARD_SIZE = 1 << 20
+SHARDS_PER_WORKER = 4
+
+
+# the file name of an #include, without quotes, brackets or the ;
+def include_name(arg):
+	return arg.strip(';').strip().strip('"').strip('<>')
+
+
+# NAME and VALUE of "#define NAME=VALUE" (or "NAME VALUE")
+def macro_definition(arg):
+	arg = arg.strip(';').strip()
+	if '=' in arg:
+		name, value = arg.split('=', 1)
+	else:
+		parts = arg.split(None, 1)
+		name, value = parts[0] if parts else '', parts[1] if len(parts) > 1 else ''
+	return name.strip(), value.strip().strip('"')
+
+
+# Whether the expression of an #if holds, with its ${NAME} macros expanded
+# already. The left side can also be the NAME of a macro. Numbers are
+# compared as numbers, anything else as text. An expression that isn't a
+# comparison holds unless it is empty or 0
+def if_condition(expression, macros):
+	expression = expression.strip(';').strip()
+	match = CONDITION.match(expression)
+	if match == None:
+		value = macros.get(expression, expression)
+		return value.strip('"') not in ('', '0')
+	left, comparison, right = match.groups()
+	left = macros.get(left, left).strip('"')
+	right = right.strip('"')
+	try:
+		left, right = float(left), float(right)
+	except ValueError:
+		pass
+	return COMPARISONS[comparison](left, right)
+
+
+class GLMPreprocessor:
+
+	def __init__(self, file_name, macros = None, file_system = None, lazy = False, digest = False):
+		self.file_name = file_name
+		# with digest set, the sha256 of the contents of every file is kept in
+		# digests by file name, e.g. to key a disk_cache.ParseCache
+		self.digest = digest
+		self.digests = {}
+		# lazy files without directives are mapped by span_tokens rather than
+		# kept as text
+		self.lazy = lazy
+		# files are read through file_system, see file_system.FileSystem
+		self.file_system = file_system if file_system != None else FileSystem()
+		# #define and #set values by name
+		self.macros = dict(macros) if macros else {}
+		# the files of the model in the order they are included, each as
+		# (raw lines or None, text with directives blanked and macros
+		# expanded, line numbers excluded by #ifdef)
+		self.files = {}
+		self.preprocess(file_name)
+
+	# Key an included file by its path relative to the file including it,
+	# falling back to the path as written if that doesn't exist (relative to
+	# the file system's base directory)
+	def resolve(self, include, parent_key):
+		key = os.path.join(os.path.dirname(parent_key), include)
+		if self.file_system.isfile(key):
+			return key
+		return include
+
+	def read(self, key):
+		return self.file_system.read_text(key)
+
+	def expand(self, line):
+		return MACRO.sub(lambda m: self.macros.get(m.group(1), m.group(0)), line)
+
+	# Read the file and everything it includes, following #if and #ifdef
+	# blocks and macros in the order GridLAB-D would
+	def preprocess(self, key):
+		text = self.read(key)
+		if self.digest:
+			self.digests[key] = hashlib.sha256(text.encode('utf-8')).hexdigest()
+		# files without directives or macros are parsed as they are
+		if not DIRECTIVE_LINE.search(text) and (not self.macros or '${' not in text):
+			self.files[key] = (None, None if self.lazy else text, set())
+			return
+
+		self.files[key] = None
+		raw = split_lines(text)
+		lines = []
+		excluded = set()
+		# one entry per open #if, #ifdef or #ifndef: whether the lines around
+		# it are active
+		active_stack = []
+		active = True
+		for line_number, line in enumerate(raw):
+			match = DIRECTIVE.match(line)
+			blank = '\n' if line.endswith('\n') else ' '
+			if not active:
+				excluded.add(line_number)
+			if match == None:
+				if active and '${' in line:
+					line = self.expand(line)
+				lines.append(line if active else blank)
+				continue
+
+			lines.append(blank)
+			directive, arg = match.group(1), match.group(2)
+			if directive in ('ifdef', 'ifndef'):
+				active_stack.append(active)
+				defined = arg.strip(';').strip() in self.macros
+				active = active and (defined if directive == 'ifdef' else not defined)
+			elif directive == 'if':
+				# not evaluated inside an excluded block, its macros may not
+				# be defined
+				active_stack.append(active)
+				active = active and if_condition(self.expand(arg), self.macros)
+			elif directive == 'else' and active_stack:
+				active = active_stack[-1] and not active
+			elif directive == 'endif' and active_stack:
+				active = active_stack.pop()
+			elif not active:
+				continue
+			elif directive in ('define', 'set'):
+				name, value = macro_definition(self.expand(arg))
+				if name:
+					self.macros[name] = value
+			elif directive == 'include':
+				include = include_name(self.expand(arg))
+				include_key = self.resolve(include, key)
+				if include_key not in self.files:
+					self.preprocess(include_key)
+
+		self.files[key] = (raw, ''.join(lines), excluded)
+
+	# the names of all the files of the model, the top one first
+	def file_names(self):
+		return list(self.files.keys())
+
+	# Yield the tokens of every file (or just of the files keys), file by file
+	def tokens(self, keys = None):
+		for key in (keys if keys != None else self.files):
+			for token in self.file_tokens(key, tokenize_glm(self.files[key][1])):
+				yield token
+
+	# Whether parallel_tokens is worth a pool of workers processes: only with
+	# more than one CPU to run them, and at least MIN_SHARD_SIZE characters
+	# of files without directives for them to parse. Below that, starting
+	# the processes and sending the objects back costs more than it saves
+	def use_pool(self, workers):
+		if workers == None or workers < 2 or (os.cpu_count() or 1) < 2:
+			return False
+		return sum(len(text) for raw, text, excluded in self.files.values() if raw == None) >= MIN_SHARD_SIZE
+
+	# Yield the same tokens as tokens(), with the files tokenized and their
+	# objects parsed (as GLM_PARSED tokens) in a pool of worker processes.
+	# Large files without directives are split into shards parsed
+	# separately. Files with directives are parsed here, against the lines
+	# as written (see parse_object). Results are yielded in include order as
+	# they come in.
+	def parallel_tokens(self, workers):
+		jobs = []
+		for key, (raw, text, excluded) in self.files.items():
+			if raw != None:
+				jobs.append((key, None, None, None))
+				continue
+			shards = min(workers * SHARDS_PER_WORKER, len(text) // MIN_SHARD_SIZE + 1)
+			for start, end, first_line in shard_ranges(text, shards):
+				jobs.append((key, start, end, first_line))
+
+		parallel = [job for job in jobs if job[1] != None]
+		with ProcessPoolExecutor(workers) as pool:
+			results = pool.map(parse_glm_text, [self.files[key][1][start:end] for key, start, end, first_line in parallel], [job[3] for job in parallel])
+			for key, start, end, first_line in jobs:
+				parsed = next(results) if start != None else tokenize_glm(self.files[key][1])
+				for token in self.file_tokens(key, parsed):
+					yield token
+
+	# Yield the tokens of every file with the objects as GLM_SPAN tokens.
+	# Files without directives are mapped into memory while they are
+	# tokenized, and the spans point into the file itself through a
+	# file_system.FileReader, which doesn't keep it open. The objects of
+	# files with directives are parsed (see parse_object)
+	def span_tokens(self, keys = None):
+		for key in (keys if keys != None else self.files):
+			raw, text, excluded = self.files[key]
+			if raw != None:
+				tokens = tokenize_glm(text)
+			elif text != None:
+				tokens = tokenize_spans(text)
+			else:
+				tokens = self.file_spans(key)
+			for token in self.file_tokens(key, tokens):
+				yield token
+
+	# tokenize_spans of the file key, with spans read through a FileReader.
+	# The file is unmapped once the tokens have been used
+	def file_spans(self, key):
+		reader = self.file_system.reader(key)
+		with reader:
+			for token in tokenize_spans(reader.buf):
+				if token[0] == GLM_SPAN:
+					_, obj_type, index, (buf, start, end), line_number = token
+					token = (GLM_SPAN, obj_type, index, (reader, start, end), line_number)
+				yield token
+
+	# Add the file and line provenance to the tokens of the file key
+	def file_tokens(self, key, tokens):
+		raw, text, excluded = self.files[key]
+		for token in tokens:
+			if token[0] == GLM_LINE:
+				_, line_number, line = token
+				# lines outside of objects are kept as they were written
+				if raw != None:
+					line = raw[line_number]
+				yield (GLM_LINE, key, line_number, line, line_number not in excluded)
+			elif token[0] == GLM_OBJECT and raw != None:
+				yield (GLM_PARSED, key) + self.parse_object(raw, *token[1:])
+			else:
+				yield (token[0], key) + token[1:]
+
+	# Parse an object of a file with directives or macros into
+	# (obj_type, index, props, comments, line_number, raw_props). The props
+	# are those of the preprocessed body. Where a line was written
+	# differently, the comments keep the line as written (directives and
+	# lines excluded by #ifdef among them), and raw_props the value of a
+	# prop with macros as [written, expanded], so the object can be written
+	# back out as it was
+	@staticmethod
+	def parse_object(raw, obj_type, index, body, line_number):
+		props, comments = parse_object_body(body)
+		raw_props = {}
+		for offset, line in enumerate(body, 1):
+			written = raw[line_number + offset]
+			if written == line:
+				continue
+			if offset in comments:
+				comments[offset] = written
+				continue
+			for name, value in parse_object_body([written])[0].items():
+				if name in props and value != props[name]:
+					raw_props[name] = [value, props[name]]
+		return (obj_type, index, props, comments, line_number, raw_props)
@@ -0,0 +1,71 @@
+from collections import namedtuple
+import inspect
+
+from glm_parse.glm_string import GLMString
+from glm_parse.glm_object import GLMObject
+from glm_parse.node import Node
+from glm_parse.edge import Edge
+from glm_parse import node, edge, other, glm_config
+
+# kind of graph element a registered class is drawn as
+NODE = 'node'
+EDGE = 'edge'
+
+# A GLM type the parser knows about, with everything the parser needs to
+# place its objects resolved once when the type is registered
+GLMType = namedtuple('GLMType', ['klass', 'list_type', 'kind'])
+
+# maps class names ("TriplexMeter" for triplex_meter objects) to GLMTypes
+GLM_TYPES = {}
+
+_class_names = {}
+
+
+# take a glm type like "triplex_meter" and return its class name "TriplexMeter"
+def glm_class_name(obj_type):
+	class_name = _class_names.get(obj_type)
+	if class_name == None:
+		class_name = _class_names[obj_type] = GLMString(obj_type).to_class_name()
+	return class_name
+
+
+def _glm_type(klass, list_type=None):
+	if list_type == None:
+		list_type = klass().list()
+
+	if issubclass(klass, Node):
+		kind = NODE
+	elif issubclass(klass, Edge):
+		kind = EDGE
+	else:
+		kind = None
+
+	return GLMType(klass, list_type, kind)
+
+
+# Register klass as the class used for objects of glm_type, e.g.
+# register_glm_type('helics_msg', HelicsMsg). The list the objects are sorted
+# into defaults to the one given by klass.list()
+def register_glm_type(glm_type, klass, list_type=None):
+	if not inspect.isclass(klass) or not issubclass(klass, GLMObject):
+		raise TypeError("{} must be a subclass of GLMObject".format(klass))
+
+	GLM_TYPES[glm_class_name(glm_type)] = _glm_type(klass, list_type)
+
+
+def lookup_glm_type(class_name):
+	return GLM_TYPES.get(class_name)
+
+
+# The class style templates of every node and edge type by class name, e.g.
+# {"Capacitor": {"shape": "doublecircle", ...}}, for clients drawing models
+# the way the DOT output does
+def class_styles():
+	return {name: dict(glm_type.klass.class_style()) for name, glm_type in GLM_TYPES.items() if glm_type.kind != None}
+
+
+# register every class defined in the object modules under its own name
+for module in (node, edge, other, glm_config):
+	for name, klass in vars(module).items():
+		if inspect.isclass(klass) and issubclass(klass, GLMObject) and hasattr(klass, 'list'):
+			GLM_TYPES[name] = _glm_type(klass)
@@ -0,0 +1,185 @@
+import re
+
+from glm_parse.glm_string import GLMString
+
+# Token kinds produced by tokenize_glm
+GLM_LINE = 'line'
+GLM_OBJECT = 'object'
+# an object with its body parsed into props and comments
+GLM_PARSED = 'parsed'
+# an object with only where its body is in the file, see tokenize_spans
+GLM_SPAN = 'span'
+
+# not reasonable to have 5000 lines in a single object for GLM
+MAX_OBJECT_LINES = 5000
+
+# a line like "object capacitor:2076 {" starts an object, the first line
+# starting with "}" closes it (nested objects end the body early)
+OBJECT_LINE = re.compile(r'^[^\S\n]*object', re.M)
+CLOSE_LINE = re.compile(r'^[^\S\n]*}', re.M)
+OBJECT_LINE_BYTES = re.compile(rb'^[^\S\n]*object', re.M)
+CLOSE_LINE_BYTES = re.compile(rb'^[^\S\n]*}', re.M)
+
+
+# split text into lines, keeping the line endings like readline does
+def split_lines(text):
+	lines = text.split('\n')
+	last = lines.pop()
+	lines = [line + '\n' for line in lines]
+	if last:
+		lines.append(last)
+	return lines
+
+
+# Split the text of a glm file into tokens in a single pass.
+# Lines outside of objects are yielded as (GLM_LINE, line_number, line)
+# and objects as (GLM_OBJECT, obj_type, index, body_lines, line_number)
+def tokenize_glm(text):
+	for token in tokenize_spans(text):
+		if token[0] == GLM_SPAN:
+			_, obj_type, index, source, line_number = token
+			yield (GLM_OBJECT, obj_type, index, split_lines(source_text(source)), line_number)
+		else:
+			yield token
+
+
+# Like tokenize_glm, but objects are yielded as
+# (GLM_SPAN, obj_type, index, (buf, start, end), line_number) with just where
+# their body is in buf instead of its lines. buf can be text, or bytes like
+# an mmap of the file, in which case start and end are byte offsets
+def tokenize_spans(buf):
+	if isinstance(buf, str):
+		object_line, close_line, newline = OBJECT_LINE, CLOSE_LINE, '\n'
+	else:
+		object_line, close_line, newline = OBJECT_LINE_BYTES, CLOSE_LINE_BYTES, b'\n'
+	pos = 0
+	line_number = 0
+	end = len(buf)
+	while pos < end:
+		match = object_line.search(buf, pos)
+		start = match.start() if match else end
+
+		# everything up to the next object is kept line by line
+		if start > pos:
+			for line in split_lines(decode_text(buf[pos:start])):
+				yield (GLM_LINE, line_number, line)
+				line_number += 1
+		if not match:
+			break
+
+		# we've found a line like "object capacitor:2076 {"
+		# the index is "capacitor:2076", the obj_type is "capacitor"
+		header_end = buf.find(newline, start) + 1 or end
+		index = decode_text(buf[start:header_end]).split()[1].strip(';')
+		obj_type = GLMString(index.split(':')[0].strip('{'))
+
+		# gather up all the lines of input that define the current object
+		close = close_line.search(buf, header_end)
+		if not close:
+			raise Exception("Failed line parsing for {} on line {}, object is never closed.".format(obj_type, line_number))
+		# the body ends where the closing line starts, so with a line ending
+		body_lines = buf[header_end:close.start()].count(newline)
+		if body_lines >= MAX_OBJECT_LINES:
+			raise Exception("Failed line parsing for {} on line {}, exceeded max line limit of 5,000.".format(obj_type, line_number + MAX_OBJECT_LINES))
+
+		yield (GLM_SPAN, obj_type, index, (buf, header_end, close.start()), line_number)
+
+		# skip over the closing line
+		line_number += body_lines + 2
+		pos = buf.find(newline, close.start()) + 1 or end
+
+
+# text of a str or utf-8 bytes. Bytes are read straight from the file,
+# so \r\n line endings become \n like when the file is read as text
+def decode_text(text):
+	if isinstance(text, str):
+		return text
+	text = text.decode('utf-8')
+	return text.replace('\r\n', '\n') if '\r' in text else text
+
+
+# The text of an object body from its (buf, start, end) source
+def source_text(source):
+	buf, start, end = source
+	return decode_text(buf[start:end])
+
+
+# Parse the body lines of an object into its properties and comments.
+# Anything that is not a property (comments, blank lines, nested objects)
+# is kept as a comment keyed by its line offset within the object.
+# intern, like dict.setdefault of a symbol table, is given each property
+# name and value (but those of the props in unique) as (string, string) and
+# returns the copy to keep
+def parse_object_body(lines, intern = None, unique = ()):
+	props = {}
+	comments = {}
+	in_nested = False
+	for line_num, line in enumerate(lines, 1):
+		a_prop2value = line.strip(' ;').split()
+
+		if len(a_prop2value) > 1 and not in_nested and a_prop2value[0][:2] != '//':
+			prop_name = a_prop2value[0]
+			if prop_name == 'object':
+				#enter nested object, all props will be comments
+				in_nested = True
+				comments[line_num] = line
+				continue
+			if len(a_prop2value) == 2:
+				value = a_prop2value[1].strip(';')
+			else:
+				#deal with spaces after initial space eg: 	floor_height 10 ft;
+				value = ' '.join(a_prop2value[1:]).strip(';')
+			if intern != None:
+				prop_name = intern(prop_name, prop_name)
+				if prop_name not in unique:
+					value = intern(value, value)
+			props[prop_name] = value
+		else:
+			if line == '}' or line == '};':
+				in_nested = False
+			comments[line_num] = line
+
+	return props, comments
+
+
+# Tokenize text and parse the objects, returning a list of GLM_LINE and
+# (GLM_PARSED, obj_type, index, props, comments, line_number) tokens.
+# first_line is the line number of the first line of text, when it is a
+# shard of a longer file. Used by worker processes, so the result is a
+# plain picklable list
+def parse_glm_text(text, first_line = 0):
+	tokens = []
+	for token in tokenize_glm(text):
+		if token[0] == GLM_OBJECT:
+			_, obj_type, index, body, line_number = token
+			props, comments = parse_object_body(body)
+			token = (GLM_PARSED, obj_type, index, props, comments, line_number + first_line)
+		else:
+			token = (GLM_LINE, token[1] + first_line, token[2])
+		tokens.append(token)
+	return tokens
+
+
+# Split text into up to count shards that tokenize the same on their own as
+# in the whole text, returned as (start, end, first_line) ranges.
+# Whatever the tokenizer is doing at some offset, after the next line
+# starting with "}" it is outside of any object (that line either closes
+# the object or isn't in one), so the next "object" line after it starts a
+# top level object and is a safe place to split.
+def shard_ranges(text, count):
+	starts = [0]
+	for i in range(1, count):
+		offset = len(text) * i // count
+		if offset <= starts[-1]:
+			continue
+		close = CLOSE_LINE.search(text, offset)
+		start = OBJECT_LINE.search(text, close.end()) if close else None
+		if start and start.start() > starts[-1]:
+			starts.append(start.start())
+
+	ranges = []
+	first_line = 0
+	for start, end in zip(starts, starts[1:] + [len(text)]):
+		ranges.append((start, end, first_line))
+		first_line += text.count('\n', start, end)
+	return ranges
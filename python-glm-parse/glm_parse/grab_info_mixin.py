@@ -1,6 +1,41 @@
 import re
 import math
-import sys
+
+import numpy as np
+
+# the properties a node's load or area is read from
+POWER_PROP = re.compile('^(constant_)?power(_12)?')
+AREA_PROP = re.compile('^floor_area')
+GROUPID_PROP = re.compile('^groupid')
+
+# kinds of property GrabInfoMixin reads
+POWER = 'power'
+AREA = 'area'
+GROUPID = 'groupid'
+
+# the kind of the property names seen, so each name is matched once rather
+# than for every object. Only the first MAX_PROP_KINDS names are kept, models
+# with more names than that have the others matched every time
+MAX_PROP_KINDS = 1 << 12
+_prop_kinds = {}
+
+
+def prop_kind(prop):
+	kind = _prop_kinds.get(prop, False)
+	if kind == False:
+		prop = str(prop)
+		if POWER_PROP.match(prop):
+			kind = POWER
+		elif AREA_PROP.match(prop):
+			kind = AREA
+		elif GROUPID_PROP.match(prop):
+			kind = GROUPID
+		else:
+			kind = None
+		if len(_prop_kinds) < MAX_PROP_KINDS:
+			_prop_kinds[prop] = kind
+	return kind
+
 
 # GrabInfo is mixed in to the node types that scale their visual area
 # based on their constant (real) power draw
@@ -8,41 +43,63 @@ import sys
 class GrabInfoMixin:
 	# number of output inches per W**(1/2) of load
 	LOAD_SCALE = 0.002
-	
-	# Returs nil if this node has no real power load
-	def size_from_power(self):
+
+	# the summed magnitude of the power of the node, 0 if it has none
+	def load_power(self):
 		pow = 0
 
 		# note that for multi-phase loads, we just sum the real power draw
 		# across the phases
-		for k, v in self['glm_props'].items():
-			if re.match('^(constant_)?power(_12)?', str(k)):
+		for k, v in self.parsed_body()[0].items():
+			if prop_kind(k) == POWER:
 				clean_v = str(v).replace(' ', '')
 				try:
 					pow += abs(complex(clean_v))
 				except:
 					pow = 0
+		return pow
+
+	# Returs nil if this node has no real power load
+	def size_from_power(self):
+		pow = self.load_power()
 		return str(math.sqrt(pow) * self.LOAD_SCALE) if pow else None
-	
-	def size_from_area(self):
+
+	# the summed floor area of the node, 0 if it has none
+	def floor_area(self):
 		area = 0
 
-		for k, v in self['glm_props'].items():
-			if re.match('^floor_area', str(k)):
-				sys.stderr.write("key: " + str(k)+ "\n")
-				sys.stderr.write(str(v))
+		for k, v in self.parsed_body()[0].items():
+			if prop_kind(k) == AREA:
 				try:
 					area += float(v)
 				except:
 					area = 5000.0
+		return area
 
+	def size_from_area(self):
+		area = self.floor_area()
 		return str(math.sqrt(area) * self.LOAD_SCALE) if area else None
-	
+
+	# size_from_power of every one of objs, scaled in one pass
+	@classmethod
+	def sizes_from_power(cls, objs):
+		return cls.sizes([obj.load_power() for obj in objs])
+
+	@classmethod
+	def sizes_from_area(cls, objs):
+		return cls.sizes([obj.floor_area() for obj in objs])
+
+	# the sizes for the powers (or areas), None where they are 0
+	@classmethod
+	def sizes(cls, values):
+		scaled = (np.sqrt(np.array(values, dtype=float)) * cls.LOAD_SCALE).tolist()
+		return [str(size) if value else None for size, value in zip(scaled, values)]
+
 	def get_groupid(self):
 		groupid = None
-		
-		for k, v in self['glm_props'].items():
-			if re.match('^groupid', str(k)):
+
+		for k, v in self.parsed_body()[0].items():
+			if prop_kind(k) == GROUPID:
 				groupid = str(v)
 
-		return groupid
\ No newline at end of file
+		return groupid
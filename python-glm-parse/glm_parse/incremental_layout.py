@@ -0,0 +1,69 @@
+import math
+from collections import deque
+
+import numpy as np
+
+from glm_parse.radial_layout import adjacency
+
+# Incremental layout.
+# Places the nodes that don't have a position yet without moving any of the
+# ones that do. Each new node is placed one edge length out from the node it
+# is first reached from, breadth first from the positioned nodes, so a new
+# branch grows outward like the tree it hangs off. The work is proportional
+# to the number of new nodes and the edges that touch them.
+
+# widest angle between the children fanned out from a node
+MAX_SPREAD = math.pi / 6
+# turn between the fans of successive positioned nodes, so they spread out
+# evenly however many there are
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+
+# Fill in x and y of the nodes that aren't placed, from the placed nodes
+# connected to them by the edges src[i] -- dst[i] of length[i]. A new node
+# between two or more placed nodes (e.g. inserted into a line) goes to
+# their mean position. Returns which nodes are placed afterwards; nodes not
+# connected to any placed node are left as they are.
+def incremental_layout(x, y, placed, src, dst, length):
+    n = len(x)
+    placed = np.array(placed, dtype=bool)
+    start, neighbours, edge = adjacency(n, np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64))
+    neighbours = neighbours.tolist()
+    edge = edge.tolist()
+    start = start.tolist()
+    length = np.asarray(length, dtype=float).tolist()
+    # the direction each node was placed in from its parent, None for the
+    # nodes that were placed already
+    heading = [None] * n
+
+    queue = deque()
+    for i in np.flatnonzero(~placed).tolist():
+        anchors = [v for v in neighbours[start[i]:start[i + 1]] if placed[v]]
+        if len(anchors) > 1:
+            x[i] = sum(x[v] for v in anchors) / len(anchors)
+            y[i] = sum(y[v] for v in anchors) / len(anchors)
+            placed[i] = True
+            queue.append(i)
+        elif anchors:
+            queue.append(anchors[0])
+
+    fans = 0
+    while queue:
+        u = queue.popleft()
+        children = [(v, length[e]) for v, e in zip(neighbours[start[u]:start[u + 1]], edge[start[u]:start[u + 1]]) if not placed[v]]
+        if not children:
+            continue
+        spread = min(MAX_SPREAD, 2 * math.pi / len(children))
+        if heading[u] == None:
+            base = fans * GOLDEN_ANGLE
+            fans += 1
+        else:
+            base = heading[u]
+        for k, (v, l) in enumerate(children):
+            angle = base + (k - (len(children) - 1) / 2) * spread
+            x[v] = x[u] + l * math.cos(angle)
+            y[v] = y[u] + l * math.sin(angle)
+            heading[v] = angle
+            placed[v] = True
+            queue.append(v)
+    return placed
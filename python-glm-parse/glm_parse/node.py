@@ -2,6 +2,8 @@
 # care to have in our graph.	For the most part they just override #dot_props to
 # provide a different visual rendering for different types of nodes.
 
+from types import MappingProxyType
+
 from glm_parse.glm_object import GLMObject
 from glm_parse.grab_info_mixin import GrabInfoMixin
 
@@ -17,9 +19,9 @@ class Node(GLMObject):
 	
 	# The default Node generates properties causing it to render as a point
 	# If the node is the SWING bus, it renders more visibly
-	# Of course, descendants of this class can override this method to cause
-	# a different rendering for different kinds of nodes
-	def dot_props(self):
+	# Descendants of this class set their own STYLE (and variable_style) to
+	# cause a different rendering for different kinds of nodes
+	def base_dot_props(self):
 		p = { 'label': '',
 					'xlabel': self.clean_xlabel(self['meta_props']['name']),
 					'shape': 'point',
@@ -54,15 +56,11 @@ class Node(GLMObject):
 
 		return p
 	
-	# The line of DOT code defined by a Node
-	def to_dot(self):
-		#set name of node if it exists(should always exist in actual glm files), else just set to id
-		if("name" in self['meta_props'].keys()):
-			name = self['meta_props']['name']
-		else:
-			name = self['meta_props']['id']
-		s = self.clean_dot_name(name) + ' ['		
-		dot_props = self.dot_props()
+	# The DOT attributes of a Node as (key, value) pairs, in the order they
+	# are written
+	def dot_attrs(self):
+		attrs = []
+		dot_props = self.cached_dot_props()
 		for k, v in dot_props.items():
 			if v != None:
 				# TO DO: handle values (v) that have double quotes in them already
@@ -73,133 +71,100 @@ class Node(GLMObject):
 				elif k == "X_pos" and v == "0.0":
 					pass
 				else:
-					s += "{k}=\"{v}\", ".format(k = k, v = v)
+					attrs.append((k, v))
+		return attrs
 
-		return s.strip(', ') + '];'
+	# The DOT name of a Node
+	def dot_head(self):
+		#set name of node if it exists(should always exist in actual glm files), else just set to id
+		if("name" in self['meta_props'].keys()):
+			name = self['meta_props']['name']
+		else:
+			name = self['meta_props']['id']
+		return self.clean_dot_name(name)
+
+	# The line of DOT code defined by a Node, with only the attributes that
+	# aren't in defaults
+	def to_dot(self, defaults = None):
+		return self.dot_line(self.dot_head(), self.dot_attrs(), defaults)
 		
 		
 
 
 class Capacitor(Node):
-	def dot_props(self):
-		#default values
-		shape = 'doublecircle'
-		width = '0.2'
-		height = '0.2'
-		fillcolor = '1'
-
-		return { **super().dot_props(), **{'shape': shape, 'width': width, 'height': height, 'fillcolor': fillcolor} }
+	STYLE = MappingProxyType({'shape': 'doublecircle', 'width': '0.2', 'height': '0.2', 'fillcolor': '1'})
 
 class Substation(Node):
-	def dot_props(self):
-		#default values
-		shape = 'doublecircle'
-		width = '0.3'
-		height = '0.3'
-		fillcolor = '1'
-
-		return { **super().dot_props(), **{'shape': shape, 'width': width, 'height': height, 'fillcolor': fillcolor} }
+	STYLE = MappingProxyType({'shape': 'doublecircle', 'width': '0.3', 'height': '0.3', 'fillcolor': '1'})
 
 class Load(Node, GrabInfoMixin):
+	# sized by its power, see variable_style
+	STYLE = MappingProxyType({'shape': 'square', 'width': None, 'height': None, 'fillcolor': '2'})
 
-	def dot_props(self):
-
+	def variable_style(self):
 		size = self.size_from_power()
+		return {'width': size, 'height': size}
 
-		#default values
-		shape = 'square'
-		width = size
-		height = size
-		fillcolor = '2'
-		
-		return { **super().dot_props(), **{'shape': shape, 'width': height, 'height': height, 'fillcolor': fillcolor} }
+	@classmethod
+	def variable_styles(cls, objs):
+		return [{'width': size, 'height': size} for size in cls.sizes_from_power(objs)]
 
 class Meter(Node):
-	def dot_props(self):
-		#default values
-		shape = 'circle'
-		width = '0.2'
-		height = '0.2'
-		fillcolor = '2'
-		
-		return { **super().dot_props(), **{'shape': shape, 'width': width, 'height': height, 'fillcolor': fillcolor} }
+	STYLE = MappingProxyType({'shape': 'circle', 'width': '0.2', 'height': '0.2', 'fillcolor': '2'})
 
 
 class DieselDg(Node):
-	def dot_props(self):
-		#default values
-		shape = 'circle'
-		width = '0.3'
-		height = '0.3'
-		fillcolor = '1'
-		
-		return { **super().dot_props(), **{'shape': shape, 'width': width, 'height': height, 'fillcolor': fillcolor} }
+	STYLE = MappingProxyType({'shape': 'circle', 'width': '0.3', 'height': '0.3', 'fillcolor': '1'})
 
 class Inverter(Node):
-	def dot_props(self):
-		#default values
-		shape = 'circle'
-		width = '0.2'
-		height = '0.2'
-		fillcolor = '2'
-		
-		return { **super().dot_props(), **{'shape': shape, 'width': width, 'height': height, 'fillcolor': fillcolor} }
+	STYLE = MappingProxyType({'shape': 'circle', 'width': '0.2', 'height': '0.2', 'fillcolor': '2'})
 
 class TriplexMeter(Node, GrabInfoMixin):
-	def dot_props(self):
-		#default values
-		shape = 'circle'
-		width = '0.15'
-		height = '0.15'
-
-		groupid = self.get_groupid()
-		if groupid == 'Commercial_Meter':
-			fillcolor = '2'
-		else:
-			fillcolor = '3'
-		
-		return { **super().dot_props(), **{'shape': shape, 'width': width, 'height': height, 'fillcolor': fillcolor} }
+	STYLE = MappingProxyType({'shape': 'circle', 'width': '0.15', 'height': '0.15', 'fillcolor': '3'})
+	COMMERCIAL = MappingProxyType({'fillcolor': '2'})
+
+	def variable_style(self):
+		if self.get_groupid() == 'Commercial_Meter':
+			return self.COMMERCIAL
+		return {}
 
 
 
 class TriplexNode(Node, GrabInfoMixin):
-	def dot_props(self):
-		size = self.size_from_power()
-		
+	# a triangle, or a house sized by its power when it has a load
+	STYLE = MappingProxyType({'shape': 'triangle', 'width': '0.15', 'height': '0.15', 'fillcolor': '7'})
+
+	@staticmethod
+	def sized_style(size):
 		if size == None:
-			shape = 'triangle'
-			fillcolor = '7'
-			height = '0.15'
-			width = '0.15'
-		else:
-			shape = 'house'
-			fillcolor = '4'
-			height = size
-			width = size
+			return {}
+		return {'shape': 'house', 'width': size, 'height': size, 'fillcolor': '4'}
+
+	def variable_style(self):
+		return self.sized_style(self.size_from_power())
 
-		return { **super().dot_props(), **{'shape': shape, 'width': width, 'height': height, 'fillcolor': fillcolor} }
+	@classmethod
+	def variable_styles(cls, objs):
+		return [cls.sized_style(size) for size in cls.sizes_from_power(objs)]
 
 
 class House(Node, GrabInfoMixin):
-	def dot_props(self):
-		size = self.size_from_area()
-		groupid = self.get_groupid()
-		
-		shape = 'house'
-		fillcolor = '4'
-		height = '0.15'
-		width = '0.15'
-		if size != None:
-			height = size
-			width = size
-			if groupid == 'Commercial':
-				shape = 'invtriangle'
-				fillcolor = '2'
-			else:
-				shape = 'house'
-				fillcolor = '4'
-		
-		return { **super().dot_props(), **{'shape': shape, 'width': width, 'height': height, 'fillcolor': fillcolor} }
+	# sized by its floor area, commercial buildings are drawn differently
+	STYLE = MappingProxyType({'shape': 'house', 'width': '0.15', 'height': '0.15', 'fillcolor': '4'})
+
+	def sized_style(self, size):
+		if size == None:
+			return {}
+		if self.get_groupid() == 'Commercial':
+			return {'shape': 'invtriangle', 'width': size, 'height': size, 'fillcolor': '2'}
+		return {'width': size, 'height': size}
+
+	def variable_style(self):
+		return self.sized_style(self.size_from_area())
+
+	@classmethod
+	def variable_styles(cls, objs):
+		return [obj.sized_style(size) for obj, size in zip(objs, cls.sizes_from_area(objs))]
 
 
 # Ignoring Recorders for now because when their parent is an edge (e.g. a
@@ -0,0 +1,159 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from glm_parse.force_layout import force_layout
+from glm_parse.radial_layout import radial_layout
+
+# Partition and stitch layout.
+# Large models are several feeders or subfeeders joined by a few edges, like
+# the transformers and regulators between voltage levels. The graph is cut
+# at those edges, every partition is laid out on its own (in a pool of
+# worker processes), and the partitions are then placed by a radial layout
+# of the coarse graph that has a node per partition and an edge per pair of
+# partitions joined by cut edges, with every edge long enough for the two
+# partitions it joins not to overlap.
+
+# partitions smaller than this many nodes are merged into a neighbouring
+# partition, so e.g. the secondaries of service transformers stay with the
+# feeder they hang off
+MIN_PARTITION_SIZE = 1000
+# the options of force_layout that are passed on to it
+FORCE_OPTIONS = ('max_iter', 'time_budget', 'seed', 'tol')
+
+
+# Label the connected components of the n nodes joined by the edges
+# src[i] -- dst[i], 0 to the number of components - 1. Every node points at
+# the lowest node it is known to be connected to: roots are hooked onto
+# lower roots across the edges, then the pointers are followed to the roots,
+# until no edge joins two roots.
+def components(n, src, dst):
+	labels = np.arange(n)
+	while True:
+		low = np.minimum(labels[src], labels[dst])
+		hooked = labels.copy()
+		np.minimum.at(hooked, labels[src], low)
+		np.minimum.at(hooked, labels[dst], low)
+		while True:
+			jumped = hooked[hooked]
+			if (jumped == hooked).all():
+				break
+			hooked = jumped
+		if (hooked == labels).all():
+			return np.unique(labels, return_inverse=True)[1]
+		labels = hooked
+
+
+# Label the partitions of the graph cut at the edges where cut is set.
+# Partitions smaller than min_size are merged with the partition across
+# any of their cut edges. The small ones left, which have no cut edges (like
+# lone nodes), are put together in one partition.
+def partitions(n, src, dst, cut, min_size = MIN_PARTITION_SIZE):
+	labels = components(n, src[~cut], dst[~cut])
+	size = np.bincount(labels).tolist()
+	parent = list(range(len(size)))
+
+	def find(a):
+		while parent[a] != a:
+			parent[a] = parent[parent[a]]
+			a = parent[a]
+		return a
+
+	for a, b in zip(labels[src[cut]].tolist(), labels[dst[cut]].tolist()):
+		a, b = find(a), find(b)
+		if a != b and (size[a] < min_size or size[b] < min_size):
+			if size[a] < size[b]:
+				a, b = b, a
+			parent[b] = a
+			size[a] += size[b]
+	small = [a for a in range(len(size)) if find(a) == a and size[a] < min_size]
+	for a in small[1:]:
+		parent[a] = small[0]
+	merged = np.array([find(a) for a in range(len(size))], dtype=np.int64)
+	return np.unique(merged[labels], return_inverse=True)[1]
+
+
+# Lay out one partition, run in the worker processes
+def layout_part(job):
+	method, n, src, dst, length, weight, roots, spacing, options = job
+	if method == 'radial':
+		return radial_layout(n, src, dst, length, spacing, roots)
+	return force_layout(n, src, dst, length, weight, **options)
+
+
+# Lay out n nodes joined by the edges src[i] -- dst[i] of length[i] and
+# weight[i], cut into partitions at the edges where cut is set. Partitions
+# are laid out with part_layout ('force' or 'radial', see layout_part) in a pool
+# of workers processes, spacing is the room a node takes. The partition of
+# the first of roots is the center of the coarse layout. Returns x, y.
+def partition_layout(n, src, dst, length, weight, cut, spacing, roots = (), part_layout = 'force', min_size = MIN_PARTITION_SIZE, workers = 1, **options):
+	src = np.asarray(src, dtype=np.int64)
+	dst = np.asarray(dst, dtype=np.int64)
+	length = np.asarray(length, dtype=float)
+	weight = np.asarray(weight, dtype=float)
+	cut = np.asarray(cut, dtype=bool)
+	labels = partitions(n, src, dst, cut, min_size)
+	if n == 0:
+		return np.zeros(0), np.zeros(0)
+	count = np.bincount(labels)
+	k = len(count)
+
+	# index of every node within its partition, and the edges inside each
+	# partition in those indexes
+	order = np.argsort(labels, kind='stable')
+	first = np.cumsum(count) - count
+	local = np.empty(n, dtype=np.int64)
+	local[order] = np.arange(n) - np.repeat(first, count)
+	inside = labels[src] == labels[dst]
+	edges = np.flatnonzero(inside)
+	edges = edges[np.argsort(labels[src[edges]], kind='stable')]
+	bounds = np.searchsorted(labels[src[edges]], np.arange(k + 1))
+	roots = [int(r) for r in roots]
+	force_options = {key: value for key, value in options.items() if key in FORCE_OPTIONS}
+	jobs = []
+	for p in range(k):
+		e = edges[bounds[p]:bounds[p + 1]]
+		part_roots = [local[r] for r in roots if labels[r] == p]
+		jobs.append((part_layout, int(count[p]), local[src[e]], local[dst[e]], length[e], weight[e], part_roots, spacing, force_options))
+
+	if workers > 1 and k > 1:
+		with ProcessPoolExecutor(min(workers, k)) as pool:
+			results = list(pool.map(layout_part, jobs))
+	else:
+		results = [layout_part(job) for job in jobs]
+
+	# every partition centered on its mean position, with the radius of the
+	# circle it fits in
+	x = np.zeros(n)
+	y = np.zeros(n)
+	radius = np.zeros(k)
+	for p, (px, py) in enumerate(results):
+		nodes = order[first[p]:first[p] + count[p]]
+		px = px - px.mean()
+		py = py - py.mean()
+		x[nodes] = px
+		y[nodes] = py
+		radius[p] = math.sqrt((px * px + py * py).max()) + spacing / 2
+
+	# the coarse graph, one edge per pair of partitions joined by cut edges
+	a = labels[src[~inside]]
+	b = labels[dst[~inside]]
+	pairs, at = np.unique(np.minimum(a, b) * k + np.maximum(a, b), return_index=True)
+	coarse_src = pairs // k
+	coarse_dst = pairs % k
+	coarse_length = radius[coarse_src] + radius[coarse_dst] + length[~inside][at]
+	# partitions joined to no other are kept clear of the center one (the
+	# largest if there are no roots) by an edge to it
+	center = labels[roots[0]] if roots else int(np.argmax(count))
+	lone = np.setdiff1d(np.arange(k), np.concatenate([coarse_src, coarse_dst, [center]]))
+	coarse_src = np.concatenate([coarse_src, np.full(len(lone), center)])
+	coarse_dst = np.concatenate([coarse_dst, lone])
+	coarse_length = np.concatenate([coarse_length, radius[center] + radius[lone] + spacing])
+	# radial_layout sizes rings by their circumference, which on rings of a
+	# few partitions is up to pi / 2 times the distance between neighbours
+	cx, cy = radial_layout(k, coarse_src, coarse_dst, coarse_length, math.pi * radius.max(), [center])
+
+	x += cx[labels]
+	y += cy[labels]
+	return x, y
@@ -2,21 +2,16 @@ import io
 import re
 from pathlib import Path
 
-def process_includes(file_name, cur_list = []):
-    cur_list.append(file_name)
-    infile = open(file_name, "r")
-    file_string = infile.read()
-    infile.seek(0)
-    while True:
-        line = infile.readline()
-        if line == '':
-            break
-        if re.match('^#include', line.strip()):
-            f = line.split()[1].strip(';')
-            f = f.strip('"')
-            if(f not in cur_list):
-                process_includes(f, cur_list)
-    infile.close()
+from glm_parse.glm_preprocessor import GLMPreprocessor
+
+# The names of the file and all the files it includes, in the order they
+# are included. cur_list is extended with them if given
+def process_includes(file_name, cur_list = None, file_system = None):
+    if cur_list == None:
+        cur_list = []
+    for f in GLMPreprocessor(file_name, file_system = file_system).file_names():
+        if f not in cur_list:
+            cur_list.append(f)
     return cur_list
 
 def load_include(line, file_name):
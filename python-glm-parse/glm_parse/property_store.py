@@ -0,0 +1,175 @@
+import cmath
+import math
+import re
+
+import numpy as np
+
+from glm_parse.grab_info_mixin import GrabInfoMixin, POWER_PROP
+
+# Columnar store of the properties of a model.
+# There is one PropertyTable per GLM class (like "triplex_meter") with a
+# column per property. Properties that are numbers for every object that has
+# them are numpy arrays, complex128 if any value is complex and float64
+# otherwise, with nan for objects that don't set them. Values with units are
+# converted to a base unit once, when the store is built, so aggregations
+# over many objects are numpy operations rather than loops parsing strings.
+
+NUMBER = r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?'
+UNSIGNED = r'(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?'
+# a GLM value like "7200", "10 ft", "1000+200j VA" or "120+30d kV", complex
+# values are rectangular (i or j) or polar with the angle in degrees (d) or
+# radians (r)
+VALUE = re.compile(r'^\s*(' + NUMBER + r')(?:\s*([+-])\s*(' + UNSIGNED + r')([ijdr]))?\s*([A-Za-z%][^\s]*)?\s*$')
+
+# unit: (base unit, value of the unit in the base unit)
+UNITS = {
+	'ft': ('ft', 1.0), 'feet': ('ft', 1.0), 'in': ('ft', 1 / 12), 'inch': ('ft', 1 / 12),
+	'yd': ('ft', 3.0), 'mile': ('ft', 5280.0), 'mi': ('ft', 5280.0),
+	'm': ('ft', 1 / 0.3048), 'km': ('ft', 1000 / 0.3048),
+	'W': ('W', 1.0), 'kW': ('W', 1e3), 'MW': ('W', 1e6),
+	'VA': ('VA', 1.0), 'kVA': ('VA', 1e3), 'MVA': ('VA', 1e6),
+	'VAr': ('VAr', 1.0), 'kVAr': ('VAr', 1e3), 'MVAr': ('VAr', 1e6),
+	'VAR': ('VAr', 1.0), 'kVAR': ('VAr', 1e3), 'MVAR': ('VAr', 1e6),
+	'V': ('V', 1.0), 'kV': ('V', 1e3),
+	'A': ('A', 1.0), 'kA': ('A', 1e3),
+}
+
+
+# Return (value, unit) for a GLM value, with the value a float or complex in
+# the base unit of its unit (None if it has no unit), or None if the value
+# isn't a number. Like meta props, anything after a ; is ignored.
+def parse_value(text):
+	match = VALUE.match(str(text).split(';')[0])
+	if not match:
+		return None
+	real, sign, imag, form, unit = match.groups()
+	value = float(real)
+	if form:
+		imag = float(sign + imag)
+		if form in 'ij':
+			value = complex(value, imag)
+		else:
+			value = cmath.rect(value, math.radians(imag) if form == 'd' else imag)
+	if unit:
+		unit, scale = UNITS.get(unit, (unit, 1.0))
+		value *= scale
+	return value, unit
+
+
+# Return (column, unit) for the values of a property, None where an object
+# doesn't set it. Properties that aren't all numbers in the same base unit
+# are kept as an object array of their strings, with unit None. That
+# includes values with a unit mixed with values without one, whose unit
+# (e.g. whether 7.2 is in V or kV) can't be told from the value.
+def typed_column(values):
+	parsed = []
+	units = set()
+	is_complex = False
+	for value in values:
+		if value == None:
+			parsed.append(math.nan)
+			continue
+		number = parse_value(value)
+		if number == None:
+			return np.array(values, dtype=object), None
+		units.add(number[1])
+		if len(units) > 1:
+			return np.array(values, dtype=object), None
+		is_complex = is_complex or isinstance(number[0], complex)
+		parsed.append(number[0])
+	return np.array(parsed, dtype=complex if is_complex else float), units.pop() if units else None
+
+
+# The GLM class of an object, "triplex_meter" for "object triplex_meter:12"
+def glm_type_of(obj):
+	return str(obj['meta_props']['id']).split(':')[0].strip('{')
+
+
+# The properties of all the objects of one GLM class, the rows in the order
+# the objects were given
+class PropertyTable:
+
+	def __init__(self, obj_type, objects):
+		self.obj_type = obj_type
+		self.names = np.array([obj['meta_props']['name'] for obj in objects], dtype=object)
+		values = {}
+		for i, obj in enumerate(objects):
+			for prop, value in obj.parsed_body()[0].items():
+				if prop not in values:
+					values[prop] = [None] * len(objects)
+				values[prop][i] = value
+		# columns and base units by property name
+		self.columns = {}
+		self.units = {}
+		for prop, column in values.items():
+			self.columns[prop], self.units[prop] = typed_column(column)
+
+	def __len__(self):
+		return len(self.names)
+
+	# the column of prop, all nan if no object of the class sets it
+	def column(self, prop):
+		if prop not in self.columns:
+			return np.full(len(self), math.nan)
+		return self.columns[prop]
+
+	# The names of the objects whose prop (its magnitude if it is complex)
+	# is between low and high, inclusive
+	def where(self, prop, low = None, high = None):
+		column = self.column(prop)
+		if column.dtype == object:
+			return self.names[:0]
+		values = np.abs(column) if column.dtype == complex else column
+		keep = ~np.isnan(values)
+		if low != None:
+			keep &= values >= low
+		if high != None:
+			keep &= values <= high
+		return self.names[keep]
+
+	# Sizes of the objects like GrabInfoMixin.size_from_power, but from
+	# power in the base unit of the columns: the square root of the summed
+	# magnitudes of their power properties, nan for objects without power
+	def load_sizes(self):
+		power = np.zeros(len(self))
+		for prop, column in self.columns.items():
+			if POWER_PROP.match(prop) and column.dtype != object:
+				power += np.nan_to_num(np.abs(column))
+		sizes = np.sqrt(power) * GrabInfoMixin.LOAD_SCALE
+		sizes[power == 0] = math.nan
+		return sizes
+
+
+class PropertyStore:
+
+	def __init__(self, objects):
+		by_type = {}
+		for obj in objects:
+			by_type.setdefault(glm_type_of(obj), []).append(obj)
+		# PropertyTables by GLM class
+		self.tables = {obj_type: PropertyTable(obj_type, objs) for obj_type, objs in by_type.items()}
+
+	# the table of a GLM class, empty if the model has no objects of it
+	def table(self, obj_type):
+		if obj_type not in self.tables:
+			return PropertyTable(obj_type, [])
+		return self.tables[obj_type]
+
+	def column(self, obj_type, prop):
+		return self.table(obj_type).column(prop)
+
+	# The sum of the numeric prop over all objects of the classes, e.g.
+	# total(['overhead_line', 'underground_line'], 'length') in feet
+	def total(self, obj_types, prop):
+		total = 0
+		for obj_type in obj_types:
+			column = self.column(obj_type, prop)
+			if column.dtype != object:
+				total += np.nansum(column)
+		return total
+
+	def where(self, obj_type, prop, low = None, high = None):
+		return self.table(obj_type).where(prop, low, high)
+
+	def load_sizes(self, obj_type):
+		return self.table(obj_type).load_sizes()
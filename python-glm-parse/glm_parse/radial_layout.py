@@ -0,0 +1,125 @@
+import numpy as np
+
+# Radial tree layout.
+# Feeders are (almost) trees hanging off a single source, so they are drawn
+# as one: the root sits in the middle, every node is on a ring by its
+# distance in edges from the root, and every subtree gets a wedge of its
+# parent's wedge proportional to its number of nodes. Each step works on a
+# whole ring of nodes at once, so the layout costs O(n) array work plus one
+# sort of the edges.
+
+
+# Adjacency of an undirected graph as (start, neighbours, edge), with the
+# neighbours of node i in neighbours[start[i]:start[i + 1]] reached through
+# the edges edge[start[i]:start[i + 1]]
+def adjacency(n, src, dst):
+    ends = np.concatenate([src, dst])
+    others = np.concatenate([dst, src])
+    edge = np.concatenate([np.arange(len(src)), np.arange(len(src))])
+    order = np.argsort(ends, kind='stable')
+    start = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(ends, minlength=n), out=start[1:])
+    return start, others[order], edge[order]
+
+
+# Breadth first search from root, setting the parent of every node it
+# reaches that has none yet (parent < 0) and the edge to it. Returns the
+# rings of newly reached nodes in order of distance.
+def spanning_tree(adj, root, parent, parent_edge):
+    start, neighbours, edge = adj
+    parent[root] = root
+    rings = []
+    ring = np.array([root], dtype=np.int64)
+    while len(ring):
+        rings.append(ring)
+        # every neighbour of the ring, tagged with the ring node it's reached from
+        count = start[ring + 1] - start[ring]
+        frm = np.repeat(ring, count)
+        slots = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count) + np.repeat(start[ring], count)
+        to = neighbours[slots]
+        new = parent[to] < 0
+        # nodes reached from several ring nodes keep the first one as parent
+        to, first = np.unique(to[new], return_index=True)
+        parent[to] = frm[new][first]
+        parent_edge[to] = edge[slots][new][first]
+        ring = to
+    return rings
+
+
+# Lay out n nodes connected by the edges src[i] -- dst[i] as a radial tree
+# around the first of roots. Nodes not connected to it are laid out around
+# the next root that reaches them, and those trees are hung off the first
+# root like subtrees. length[i] is the shortest radial distance an edge
+# is drawn with and spacing the room each node takes on its ring.
+# Returns x, y centered on the root.
+def radial_layout(n, src, dst, length, spacing, roots = ()):
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    length = np.asarray(length, dtype=float)
+    x = np.zeros(n)
+    y = np.zeros(n)
+    if n == 0:
+        return x, y
+
+    # the first root is the center, the best connected node if there are no
+    # roots. Every other component hangs off it from its own root if it has
+    # one and from its first node otherwise, nodes without edges go straight
+    # onto the first ring.
+    adj = adjacency(n, src, dst)
+    degree = adj[0][1:] - adj[0][:-1]
+    roots = [int(r) for r in roots] or [int(np.argmax(degree))]
+    center = roots[0]
+    parent = np.full(n, -1, dtype=np.int64)
+    parent_edge = np.full(n, -1, dtype=np.int64)
+    depth = np.zeros(n, dtype=np.int64)
+    rings = [[r] for r in spanning_tree(adj, center, parent, parent_edge)]
+    lone = np.flatnonzero((degree == 0) & (parent < 0))
+    parent[lone] = center
+    depth[lone] = 1
+    if len(rings) == 1:
+        rings.append([])
+    rings[1].append(lone)
+    for root in roots[1:] + list(np.flatnonzero(parent < 0)):
+        if parent[root] >= 0:
+            continue
+        component = spanning_tree(adj, root, parent, parent_edge)
+        parent[root] = center
+        for d, ring in enumerate(component, 1):
+            if len(rings) <= d:
+                rings.append([])
+            rings[d].append(ring)
+    rings = [np.concatenate(r) for r in rings]
+    for d, ring in enumerate(rings):
+        depth[ring] = d
+
+    # subtree sizes, from the outermost ring in
+    size = np.ones(n)
+    for ring in rings[:0:-1]:
+        np.add.at(size, parent[ring], size[ring])
+
+    # split every parent's wedge among its children by subtree size, ring by ring
+    wedge = np.zeros(n)
+    first = np.zeros(n)
+    wedge[center] = 2 * np.pi
+    edge_len = np.where(parent_edge >= 0, length[np.maximum(parent_edge, 0)], 0) if len(length) else np.zeros(n)
+    radius = np.zeros(len(rings))
+    for d, ring in enumerate(rings[1:], 1):
+        if len(ring) == 0:
+            continue
+        ring = ring[np.argsort(parent[ring], kind='stable')]
+        p = parent[ring]
+        # subtract the parent itself from the nodes its wedge is shared by
+        wedge[ring] = wedge[p] * size[ring] / (size[p] - 1)
+        # each child starts where its older siblings end
+        end = np.cumsum(wedge[ring])
+        group_start = np.searchsorted(p, p, side='left')
+        first[ring] = first[p] + end - wedge[ring] - (end[group_start] - wedge[ring][group_start])
+
+        # the ring is far enough out for every edge to it and long enough
+        # to fit all of its nodes
+        radius[d] = max(radius[d - 1] + edge_len[ring].max(), len(ring) * spacing / (2 * np.pi))
+
+    angle = first + wedge / 2
+    x = radius[depth] * np.cos(angle)
+    y = radius[depth] * np.sin(angle)
+    return x, y
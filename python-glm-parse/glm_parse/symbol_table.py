@@ -0,0 +1,89 @@
+from itertools import chain
+
+from glm_parse.glm_tokenizer import parse_object_body
+
+# props whose values are (nearly) different for every object, like names and
+# coordinates. Their values aren't interned, that would only grow the table
+UNIQUE_PROPS = frozenset(('name', 'id', 'from', 'to', 'parent', 'latitude', 'longitude', 'line_number', 'X_pos', 'Y_pos'))
+# the most strings a table keeps, unless it is given another max_size
+MAX_SYMBOLS = 1 << 16
+
+# Shared table of the strings of parsed models.
+# The same property names and values ("phases", "ABCN", "7200") repeat across
+# thousands of objects, and would otherwise each be a string of their own.
+# intern() returns the one copy kept in the table, so the repeats share it
+# (and compare equal by identity). The values of UNIQUE_PROPS are left as
+# they are, and once the table holds max_size strings it only hands out
+# those it has, so it stays small however large the models are. Counts are
+# kept of how much was deduplicated.
+class SymbolTable:
+
+	def __init__(self, max_size = MAX_SYMBOLS):
+		self.symbols = {}
+		self.max_size = max_size
+		# strings looked up, and how many of them were already in the table
+		self.lookups = 0
+		self.duplicates = 0
+
+	def full(self):
+		return len(self.symbols) >= self.max_size
+
+	# what strings are looked up with, as lookup(string, string): adding
+	# them to the table until it is full
+	def lookup(self):
+		return self.symbols.get if self.full() else self.symbols.setdefault
+
+	def intern(self, value):
+		if type(value) != str:
+			return value
+		self.lookups += 1
+		symbol = self.lookup()(value, value)
+		if symbol is not value:
+			self.duplicates += 1
+		return symbol
+
+	# a copy of d with its string keys interned, and its string values but
+	# those of UNIQUE_PROPS
+	def intern_dict(self, d):
+		intern = self.intern
+		return {intern(key): value if key in UNIQUE_PROPS else intern(value) for key, value in d.items()}
+
+	# intern_dict for the glm_props of a parsed object, whose keys and values
+	# are all strings. Done for every object parsed, so the lookups are
+	# inlined and counted afterwards (see count)
+	def intern_props(self, props):
+		size, full = len(self.symbols), self.full()
+		intern = self.lookup()
+		interned = {intern(key, key): value if key in UNIQUE_PROPS else intern(value, value) for key, value in props.items()}
+		self.count(interned, size, full)
+		return interned
+
+	# glm_tokenizer.parse_object_body of the body lines of an object, with
+	# the props interned as they are parsed rather than copied afterwards
+	def parse_body(self, lines):
+		size, full = len(self.symbols), self.full()
+		props, comments = parse_object_body(lines, self.lookup(), UNIQUE_PROPS)
+		self.count(props, size, full)
+		return props, comments
+
+	# Count the lookups of the interned props, with size the number of
+	# symbols before. Until the table is full, every string that didn't add
+	# a symbol was a duplicate. After, those in the table are
+	def count(self, props, size, full):
+		lookups = 2 * len(props) - len(UNIQUE_PROPS.intersection(props))
+		self.lookups += lookups
+		if full:
+			values = [value for key, value in props.items() if key not in UNIQUE_PROPS]
+			self.duplicates += sum(map(self.symbols.__contains__, chain(props, values)))
+		else:
+			self.duplicates += lookups - (len(self.symbols) - size)
+
+	def stats(self):
+		return {
+			'symbols': len(self.symbols),
+			'lookups': self.lookups,
+			'duplicates': self.duplicates
+		}
+
+	def __str__(self):
+		return "{symbols} symbols, {duplicates} of {lookups} strings deduplicated".format(**self.stats())
@@ -0,0 +1,53 @@
+# A dict that counts the changes made to it, so the glm_props and
+# meta_props of a GLMObject can be edited in place (like
+# obj['glm_props']['phases'] = 'AN') and whatever was computed from them,
+# like the DOT props, still knows it is out of date (see
+# GLMObject.props_version).
+# changes is only set by the first change, so a TrackedDict is made as fast
+# as a dict (one is made for every object parsed)
+class TrackedDict(dict):
+	__slots__ = ('changes',)
+
+	def count(self):
+		self.changes = getattr(self, 'changes', 0) + 1
+
+	# counted inline, it is what every prop set by the parser or a layout
+	# goes through
+	def __setitem__(self, key, value):
+		self.changes = getattr(self, 'changes', 0) + 1
+		dict.__setitem__(self, key, value)
+
+	def __delitem__(self, key):
+		self.count()
+		super().__delitem__(key)
+
+	def __ior__(self, other):
+		self.count()
+		return super().__ior__(other)
+
+	def update(self, *args, **kwargs):
+		self.count()
+		super().update(*args, **kwargs)
+
+	def setdefault(self, key, default = None):
+		self.count()
+		return super().setdefault(key, default)
+
+	def pop(self, *args):
+		self.count()
+		return super().pop(*args)
+
+	def popitem(self):
+		self.count()
+		return super().popitem()
+
+	def clear(self):
+		self.count()
+		super().clear()
+
+	# Pickled like a dict, the count only matters while it is in memory
+	def __reduce__(self):
+		return (TrackedDict, (), None, None, iter(self.items()))
+
+	def copy(self):
+		return TrackedDict(self)
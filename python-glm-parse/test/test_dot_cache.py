@@ -0,0 +1,77 @@
+import os
+import io
+import pickle
+import unittest
+import contextlib
+
+from glm_parse import Converter
+from glm_parse.tracked_dict import TrackedDict
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def convert(**options):
+	with contextlib.redirect_stdout(io.StringIO()):
+		return Converter('main.glm', calc_pos=False, base_dir=os.path.join(FIXTURES, 'feeder'), **options)
+
+
+# The cached DOT props of an object follow edits of its props, in place or
+# not
+class DotCacheTest(unittest.TestCase):
+
+	def check_edits(self, converter):
+		swing = converter.getObject('top_swing')
+		self.assertIn('doubleoctagon', swing.to_dot())
+
+		swing['meta_props']['bustype'] = 'PQ'
+		self.assertNotIn('doubleoctagon', swing.to_dot())
+		del swing['meta_props']['bustype']
+		self.assertNotIn('doubleoctagon', swing.to_dot())
+		swing['meta_props'].update(bustype='SWING')
+		self.assertIn('doubleoctagon', swing.to_dot())
+
+		# renamed
+		swing['meta_props']['name'] = 'renamed_swing'
+		self.assertIn('renamed_swing', swing.to_dot())
+
+		swing['meta_props']['X_pos'] = '12.5'
+		swing['meta_props']['Y_pos'] = '7.25'
+		self.assertIn('pos="12.5,7.25!"', swing.to_dot())
+
+		# replaced
+		meta_props = dict(swing['meta_props'])
+		meta_props['bustype'] = 'PQ'
+		swing['meta_props'] = meta_props
+		self.assertNotIn('doubleoctagon', swing.to_dot())
+		swing['meta_props']['bustype'] = 'SWING'
+		self.assertIn('doubleoctagon', swing.to_dot())
+
+		edge = converter.lists['edges'][0]
+		edge['meta_props']['length'] = '2000'
+		self.assertIn('len="10.0"', edge.to_dot())
+
+	def test_edits(self):
+		self.check_edits(convert())
+
+	def test_lazy_edits(self):
+		self.check_edits(convert(lazy=True))
+
+	def test_glm_props(self):
+		converter = convert()
+		house = next(obj for obj in converter.lists['nodes'] if obj['meta_props']['obj_type'] == 'House')
+		before = house.to_dot()
+		house['glm_props']['floor_area'] = str(float(house['glm_props']['floor_area']) * 4)
+		self.assertNotEqual(house.to_dot(), before)
+
+	def test_tracked(self):
+		converter = convert()
+		node = converter.lists['nodes'][0]
+		self.assertIsInstance(node['meta_props'], TrackedDict)
+		self.assertIsInstance(node['glm_props'], TrackedDict)
+		copy = pickle.loads(pickle.dumps(node))
+		self.assertIsInstance(copy['meta_props'], TrackedDict)
+		self.assertEqual(copy, node)
+
+
+if __name__ == '__main__':
+	unittest.main()
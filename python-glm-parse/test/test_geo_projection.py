@@ -0,0 +1,56 @@
+import math
+import unittest
+
+import numpy as np
+
+from glm_parse.geo_projection import project, parse_coordinate, register_projection, PROJECTIONS, EARTH_RADIUS, WEB_MERCATOR_RADIUS
+
+
+# Projections of points whose x/y in meters are known
+class ProjectionTest(unittest.TestCase):
+
+	def assertProjected(self, projection, lat, lng, x, y, delta):
+		px, py = project(lat, lng, projection)
+		np.testing.assert_allclose(px, x, rtol=0, atol=delta)
+		np.testing.assert_allclose(py, y, rtol=0, atol=delta)
+
+	def test_mercator(self):
+		# EPSG:3857 coordinates of the origin, the antimeridian and 45N
+		self.assertProjected('mercator', [0, 0, 45], [0, 180, -90],
+			[0, math.pi * WEB_MERCATOR_RADIUS, -math.pi / 2 * WEB_MERCATOR_RADIUS],
+			[0, 0, 5621521.486], 0.001)
+
+	def test_equirectangular(self):
+		# longitudes are scaled by the cosine of the middle latitude
+		self.assertProjected('equirectangular', [-10, 10], [0, 20],
+			[0, math.radians(20) * EARTH_RADIUS], [math.radians(-10) * EARTH_RADIUS, math.radians(10) * EARTH_RADIUS], 0.001)
+		self.assertProjected('equirectangular', [59, 61], [0, 1],
+			[0, math.radians(1) * math.cos(math.radians(60)) * EARTH_RADIUS], [math.radians(59) * EARTH_RADIUS, math.radians(61) * EARTH_RADIUS], 0.001)
+
+	def test_local(self):
+		# offsets from the middle of the map: a degree of latitude is
+		# 111132.95 m at 45N on WGS84, a degree of longitude 78846.81 m
+		self.assertProjected('local', [44.995, 45.0, 45.005], [-0.005, 0.0, 0.005],
+			[-0.005 * 78846.81, 0, 0.005 * 78846.81], [-0.005 * 111132.95, 0, 0.005 * 111132.95], 0.05)
+
+	def test_unknown(self):
+		with self.assertRaises(ValueError):
+			project([0], [0], 'lambert')
+
+	def test_register(self):
+		register_projection('degrees', lambda lat, lng: (np.degrees(lng), np.degrees(lat)))
+		try:
+			self.assertProjected('degrees', [45], [-105], [-105], [45], 1e-9)
+		finally:
+			del PROJECTIONS['degrees']
+
+	def test_parse_coordinate(self):
+		self.assertEqual(parse_coordinate('45.5'), 45.5)
+		self.assertAlmostEqual(parse_coordinate('46N12:34.5'), 46 + 12 / 60 + 34.5 / 3600)
+		self.assertAlmostEqual(parse_coordinate('"122W30"'), -122.5)
+		self.assertEqual(parse_coordinate('somewhere'), None)
+		self.assertEqual(parse_coordinate(None), None)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,117 @@
+import io
+import unittest
+import contextlib
+
+from glm_parse import Converter
+from glm_parse.file_system import MemoryFileSystem
+
+# line_1 comes before the meter it feeds, line_2 runs from a load to its
+# parent rather than the other way round
+MODEL = '''object node {
+	name swing;
+	bustype SWING;
+}
+object overhead_line {
+	name line_1;
+	from swing;
+	to meter_1;
+}
+object meter {
+	name meter_1;
+	parent swing;
+}
+object overhead_line {
+	name line_2;
+	from load_1;
+	to meter_1;
+}
+object load {
+	name load_1;
+	parent meter_1;
+}
+object load {
+	name load_2;
+	parent meter_1;
+}
+object node {
+	name meter_1;
+}
+object triplex_node {
+	phases AS;
+}
+object triplex_node {
+	phases BS;
+}
+'''
+
+
+def convert(file_name = 'main.glm', files = None):
+	with contextlib.redirect_stdout(io.StringIO()):
+		return Converter(file_name, calc_pos=False, file_system=MemoryFileSystem(files or {'main.glm': MODEL}))
+
+
+def ends(edges):
+	return [(e['meta_props']['from'], e['meta_props']['to']) for e in edges]
+
+
+# The name and edge indexes of the converter: the dummy edges linking
+# children to their parents are only made where there isn't an edge already
+class IndexTest(unittest.TestCase):
+
+	def setUp(self):
+		self.converter = convert()
+
+	def test_dummy_edges(self):
+		# meter_1 is fed by line_1, the loads only have line_2 going the
+		# other way
+		self.assertEqual(ends(self.converter.lists['dummy_edges']), [('meter_1', 'load_1'), ('meter_1', 'load_2')])
+
+	def test_has_edge(self):
+		converter = self.converter
+		self.assertTrue(converter.hasEdge('swing', 'meter_1'))
+		self.assertTrue(converter.hasEdge('load_1', 'meter_1'))
+		self.assertFalse(converter.hasEdge('meter_1', 'swing'))
+		self.assertFalse(converter.hasEdge('swing', 'nowhere'))
+		# dummy edges don't count
+		self.assertFalse(converter.hasEdge('meter_1', 'load_2'))
+		self.assertEqual(ends(converter.nodeEdges('load_2')), [('meter_1', 'load_2')])
+
+	def test_add_dummy_edge(self):
+		converter = self.converter
+		load = converter.getObject('load_2')
+		# linked again, since the first link was a dummy edge itself
+		converter.addDummyEdge(load)
+		self.assertEqual(ends(converter.lists['dummy_edges'])[2:], [('meter_1', 'load_2')])
+		self.assertEqual(len(converter.nodeEdges('load_2')), 2)
+		converter.addDummyEdge(converter.getObject('meter_1'))
+		self.assertEqual(len(converter.lists['dummy_edges']), 3)
+
+	def test_node_edges(self):
+		converter = self.converter
+		self.assertEqual(ends(converter.nodeEdges('meter_1')), [('swing', 'meter_1'), ('load_1', 'meter_1'), ('meter_1', 'load_1'), ('meter_1', 'load_2')])
+		self.assertEqual(converter.nodeEdges('nowhere'), ())
+
+	def test_get_object(self):
+		converter = self.converter
+		# the first object of a name
+		meter = converter.getObject('meter_1')
+		self.assertIs(meter, converter.lists['nodes'][1])
+		self.assertEqual(meter['meta_props']['obj_type'], 'Meter')
+		self.assertIs(converter.getObject('line_2'), converter.lists['edges'][1])
+		self.assertEqual(converter.getObject('nowhere'), None)
+		# objects without a name, and dummy edges, aren't indexed
+		self.assertEqual(len([n for n in converter.lists['nodes'] if n['meta_props']['name'] == 'NO_NAME_FOUND']), 2)
+		self.assertEqual(converter.getObject('NO_NAME_FOUND'), None)
+		self.assertEqual(converter.getObject('dummy_meter_1_load_1'), None)
+
+	def test_json_round_trip(self):
+		# the indexes are rebuilt from a saved model. It has the nodes before
+		# the edges, so meter_1 is read before line_1 and linked to swing
+		reloaded = convert('model.json', {'model.json': self.converter.to_json()})
+		self.assertEqual(ends(reloaded.lists['dummy_edges']), [('swing', 'meter_1')] + ends(self.converter.lists['dummy_edges']))
+		self.assertIs(reloaded.getObject('meter_1'), reloaded.lists['nodes'][1])
+		self.assertTrue(reloaded.hasEdge('swing', 'meter_1'))
+
+
+if __name__ == '__main__':
+	unittest.main()
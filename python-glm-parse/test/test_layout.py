@@ -0,0 +1,155 @@
+import os
+import io
+import json
+import sys
+import math
+import types
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+from glm_parse import Converter
+from glm_parse.calc_XY import calc_graphviz_neato
+from glm_parse.disk_cache import LayoutCache
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def convert(model = 'feeder', **options):
+	with contextlib.redirect_stdout(io.StringIO()):
+		return Converter('main.glm', calc_pos=False, base_dir=os.path.join(FIXTURES, model), **options)
+
+
+def positions(converter):
+	return [(n['meta_props'].get('X_pos'), n['meta_props'].get('Y_pos')) for n in converter.lists['nodes']]
+
+
+class LayoutCacheTest(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.cache = LayoutCache(self.dir)
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def test_cached_layout(self):
+		laid_out = convert()
+		laid_out.layout('radial')
+		cached = convert(layout_cache=self.cache)
+		cached.layout('radial')
+		self.assertEqual(len(self.cache.entries()), 1)
+		loaded = convert(layout_cache=self.cache)
+		loaded.layout('radial')
+		self.assertEqual(len(self.cache.entries()), 1)
+		self.assertEqual(positions(loaded), positions(laid_out))
+		self.assertEqual(loaded.to_dot(), laid_out.to_dot())
+
+	def test_key(self):
+		converter = convert(position_layout='radial')
+		key = self.cache.layout_key(converter)
+		self.assertEqual(self.cache.layout_key(convert(position_layout='radial')), key)
+		self.assertNotEqual(self.cache.layout_key(convert(position_layout='force')), key)
+
+		# the layouts are rooted at the SWING bus, and the classes of nodes
+		# and edges decide where the partition layout cuts the graph
+		swing = converter.getObject('top_swing')
+		swing['meta_props']['bustype'] = 'PQ'
+		self.assertNotEqual(self.cache.layout_key(converter), key)
+		swing['meta_props']['bustype'] = 'SWING'
+		self.assertEqual(self.cache.layout_key(converter), key)
+		swing['meta_props']['obj_type'] = 'Substation'
+		self.assertNotEqual(self.cache.layout_key(converter), key)
+		swing['meta_props']['obj_type'] = 'Node'
+		converter.lists['edges'][0]['meta_props']['obj_type'] = 'Regulator'
+		self.assertNotEqual(self.cache.layout_key(converter), key)
+
+
+class LayoutTest(unittest.TestCase):
+
+	def assertPlaced(self, converter):
+		for n in converter.lists['nodes']:
+			x, y = float(n['meta_props']['X_pos']), float(n['meta_props']['Y_pos'])
+			self.assertFalse(math.isnan(x) or math.isnan(y))
+
+	def test_layouts(self):
+		# every node is placed, and the same model is laid out the same way
+		# (the feeder is cut into partitions with min_size)
+		for method, options in (('radial', {}), ('force', {}), ('partition', {}), ('partition', {'min_size': 5})):
+			with self.subTest(method=method, **options):
+				converter = convert(workers=1)
+				converter.layout(method, **options)
+				self.assertPlaced(converter)
+				again = convert(workers=1)
+				again.layout(method, **options)
+				self.assertEqual(positions(again), positions(converter))
+
+	def test_incremental(self):
+		converter = convert()
+		converter.layout('radial')
+		laid_out = positions(converter)
+		# a saved model with nodes that have no position, or the "0.0" one
+		# written for nodes that weren't laid out
+		document = json.loads(converter.to_json())
+		names = [n['meta_props']['name'] for n in document['objects']['nodes']]
+		unplaced = [i for i, name in enumerate(names) if name.startswith('p1_') and names.count(name) == 1]
+		for i in unplaced:
+			meta_props = document['objects']['nodes'][i]['meta_props']
+			if i % 2:
+				del meta_props['X_pos'], meta_props['Y_pos']
+			else:
+				meta_props['X_pos'] = meta_props['Y_pos'] = "0.0"
+		dir = tempfile.mkdtemp()
+		try:
+			with open(os.path.join(dir, 'model.json'), 'w') as f:
+				json.dump(document, f)
+			with contextlib.redirect_stdout(io.StringIO()):
+				incremental = Converter(os.path.join(dir, 'model.json'), position_layout='incremental')
+		finally:
+			shutil.rmtree(dir)
+		# only the unplaced nodes are laid out, the others don't move
+		self.assertEqual(sorted(names.index(n['meta_props']['name']) for n in incremental.unplaced), unplaced)
+		incremental.ensureLayout()
+		self.assertPlaced(incremental)
+		self.assertEqual(incremental.unplaced, [])
+		after = positions(incremental)
+		self.assertTrue(unplaced)
+		for i, position in enumerate(after):
+			if i in unplaced:
+				self.assertNotEqual(position, ("0.0", "0.0"))
+			else:
+				self.assertEqual(position, laid_out[i])
+
+
+class GraphvizTest(unittest.TestCase):
+
+	# graphviz lays out the DOT file in the order of the model, not the
+	# compact form grouped by class
+	def test_dot_order(self):
+		sources = []
+
+		class Source:
+			def __init__(self, text, engine, format):
+				sources.append(text)
+
+			def pipe(self):
+				return '{}'
+
+		graphviz = types.ModuleType('graphviz')
+		graphviz.Source = Source
+		saved = sys.modules.get('graphviz')
+		sys.modules['graphviz'] = graphviz
+		try:
+			converter = convert()
+			calc_graphviz_neato(converter)
+		finally:
+			if saved != None:
+				sys.modules['graphviz'] = saved
+			else:
+				del sys.modules['graphviz']
+		self.assertEqual(sources, [converter.to_dot()])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,70 @@
+import os
+import io
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+from glm_parse import Converter
+from glm_parse.disk_cache import LayoutCache
+from glm_parse.file_system import FileReader
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+# Lazy objects read their bodies back from the files, which are only mapped
+# while they are parsed and during output
+class LazyTest(unittest.TestCase):
+
+	def setUp(self):
+		with contextlib.redirect_stdout(io.StringIO()):
+			self.converter = Converter('main.glm', calc_pos=False, base_dir=os.path.join(FIXTURES, 'feeder'), lazy=True)
+		self.readers = {obj.source[0] for obj in self.converter.lists['nodes'] if obj.source != None}
+
+	def assertClosed(self):
+		self.assertTrue(self.readers)
+		for reader in self.readers:
+			self.assertIsInstance(reader, FileReader)
+			self.assertIsNone(reader.buf)
+
+	def test_closed_after_parse(self):
+		self.assertClosed()
+
+	def test_closed_after_output(self):
+		self.converter.to_json()
+		self.converter.to_glm()
+		self.converter.to_dot()
+		self.assertClosed()
+
+	def test_read_on_demand(self):
+		lazy = [obj for obj in self.converter.lists['nodes'] if obj.source != None]
+		glm_props = lazy[0]['glm_props']
+		self.assertEqual(glm_props['name'], lazy[0]['meta_props']['name'])
+		self.assertIsNone(lazy[0].source)
+		self.assertClosed()
+
+
+	# layouts read the coordinates of lazy objects without decoding them
+	def test_geo_layout(self):
+		with contextlib.redirect_stdout(io.StringIO()):
+			converter = Converter('main.glm', calc_pos=False, calc_geo_pos=True, base_dir=os.path.join(FIXTURES, 'geo_feeder'), lazy=True)
+		lazy = [obj for obj in converter.lists['nodes'] if obj.source != None]
+		self.assertTrue(lazy)
+		converter.layout()
+		self.assertTrue(all(obj.source != None for obj in lazy))
+		self.assertTrue(all('X_pos' in obj['meta_props'] for obj in lazy))
+
+	def test_geo_layout_cache(self):
+		cache_dir = tempfile.mkdtemp()
+		try:
+			with contextlib.redirect_stdout(io.StringIO()):
+				converter = Converter('main.glm', calc_pos=False, calc_geo_pos=True, base_dir=os.path.join(FIXTURES, 'geo_feeder'), lazy=True, layout_cache=LayoutCache(cache_dir))
+			lazy = [obj for obj in converter.lists['nodes'] if obj.source != None]
+			converter.layout()
+			self.assertTrue(all(obj.source != None for obj in lazy))
+		finally:
+			shutil.rmtree(cache_dir)
+
+
+if __name__ == '__main__':
+	unittest.main()
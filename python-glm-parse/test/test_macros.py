@@ -0,0 +1,68 @@
+import os
+import io
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+from glm_parse import Converter
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+MODEL_DIR = os.path.join(FIXTURES, 'macros')
+
+
+def convert(**options):
+	with contextlib.redirect_stdout(io.StringIO()):
+		return Converter('main.glm', calc_pos=False, base_dir=MODEL_DIR, **options)
+
+
+# Objects with ${NAME} macros and directives in their bodies have the macros
+# expanded in their props, and are written back out as they were written
+class MacroTest(unittest.TestCase):
+
+	def setUp(self):
+		with open(os.path.join(MODEL_DIR, 'main.glm')) as f:
+			# the writer leaves out the line ending at the end of the file
+			self.text = f.read().rstrip()
+
+	def test_props_expanded(self):
+		converter = convert()
+		meter = converter.getObject('meter_1')
+		self.assertEqual(meter['glm_props']['phases'], 'ABCN')
+		self.assertEqual(meter['glm_props']['nominal_voltage'], '7200')
+		self.assertEqual(converter.getObject('line_1')['glm_props']['phases'], 'ABCN')
+
+	def test_nested_if(self):
+		# #if blocks nest with the #ifdef blocks in and around them
+		load = convert().getObject('load_1')
+		self.assertEqual(load['glm_props']['phases'], 'ABCN')
+		self.assertEqual(load['glm_props']['nominal_voltage'], '7200')
+		self.assertNotIn('base_power', load['glm_props'])
+		self.assertNotIn('constant_power_A', load['glm_props'])
+
+	def test_round_trip(self):
+		for options in ({}, {'lazy': True}, {'workers': 2}):
+			with self.subTest(**options):
+				self.assertEqual(convert(**options).to_glm_dict()['main.glm'], self.text)
+
+	def test_json_round_trip(self):
+		out_dir = tempfile.mkdtemp()
+		try:
+			json_file = os.path.join(out_dir, 'model.json')
+			convert().writeJson(json_file)
+			with contextlib.redirect_stdout(io.StringIO()):
+				reloaded = Converter(json_file, calc_pos=False)
+			self.assertEqual(reloaded.to_glm_dict()['main.glm'], self.text)
+		finally:
+			shutil.rmtree(out_dir)
+
+	def test_changed_value(self):
+		converter = convert()
+		converter.getObject('swing')['glm_props']['phases'] = 'AN'
+		text = converter.to_glm_dict()['main.glm']
+		self.assertIn('\tphases AN;\n\tnominal_voltage ${VOLTAGE};\n', text)
+		self.assertEqual(text.count('${PHASES}'), self.text.count('${PHASES}') - 1)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,84 @@
+import cmath
+import math
+import unittest
+
+import numpy as np
+
+from glm_parse.property_store import parse_value, typed_column, PropertyStore
+from glm_parse.glm_object import GLMObject
+
+
+class ParseValueTest(unittest.TestCase):
+
+	def assertValue(self, text, value, unit):
+		parsed, parsed_unit = parse_value(text)
+		self.assertEqual(parsed_unit, unit)
+		self.assertTrue(cmath.isclose(parsed, value), '{} != {}'.format(parsed, value))
+
+	def test_numbers(self):
+		self.assertValue('7200', 7200.0, None)
+		self.assertValue('-1.5e3', -1500.0, None)
+		self.assertValue('.25;', 0.25, None)
+		self.assertIsNone(parse_value('ABCN'))
+		self.assertIsNone(parse_value(''))
+
+	def test_rectangular(self):
+		self.assertValue('1000+200j', complex(1000, 200), None)
+		self.assertValue('1000-200i VA', complex(1000, -200), 'VA')
+		self.assertValue('0.1+0.2j', complex(0.1, 0.2), None)
+
+	def test_polar(self):
+		self.assertValue('120+30d', cmath.rect(120, math.radians(30)), None)
+		self.assertValue('120-90d V', complex(0, -120), 'V')
+		self.assertValue('2+1.5r', cmath.rect(2, 1.5), None)
+
+	def test_scaled(self):
+		self.assertValue('10 ft', 10.0, 'ft')
+		self.assertValue('1 mile', 5280.0, 'ft')
+		self.assertValue('6 in', 0.5, 'ft')
+		self.assertValue('1.2 kVA', 1200.0, 'VA')
+		self.assertValue('7.2 kV', 7200.0, 'V')
+		self.assertValue('1+1j MVA', complex(1e6, 1e6), 'VA')
+		self.assertValue('120+30d kV', cmath.rect(120e3, math.radians(30)), 'V')
+		# units without a scale are kept as they are
+		self.assertValue('2 pu', 2.0, 'pu')
+
+
+class TypedColumnTest(unittest.TestCase):
+
+	def test_numbers(self):
+		column, unit = typed_column(['1', None, '2.5'])
+		self.assertEqual(column.dtype, float)
+		self.assertIsNone(unit)
+		self.assertTrue(math.isnan(column[1]))
+
+	def test_units(self):
+		column, unit = typed_column(['1 kV', '120 V', None])
+		self.assertEqual(unit, 'V')
+		self.assertEqual(column[:2].tolist(), [1000.0, 120.0])
+
+	def test_complex(self):
+		column, unit = typed_column(['1000+200j', '5'])
+		self.assertEqual(column.dtype, complex)
+
+	def test_mixed_units(self):
+		for values in (['7.2 kV', '120'], ['120', '7.2 kV'], ['10 ft', '5 V'], ['1', 'ABCN']):
+			with self.subTest(values=values):
+				column, unit = typed_column(values)
+				self.assertEqual(column.dtype, object)
+				self.assertEqual(column.tolist(), values)
+				self.assertIsNone(unit)
+
+	def test_store(self):
+		objects = []
+		for i, voltage in enumerate(['7.2 kV', '7200', '7.2 kV']):
+			obj = GLMObject(props={'name': 'n{}'.format(i), 'nominal_voltage': voltage, 'length': '{} ft'.format(i)}, id='node:{}'.format(i), obj_type='Node')
+			objects.append(obj)
+		store = PropertyStore(objects)
+		self.assertEqual(store.column('node', 'nominal_voltage').dtype, object)
+		self.assertEqual(store.total(['node'], 'nominal_voltage'), 0)
+		self.assertEqual(store.total(['node'], 'length'), 3.0)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,102 @@
+import os
+import io
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+from glm_parse import Converter
+from glm_parse.disk_cache import ParseCache
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# a node and a line to it added at the end of a file
+NEW_NODE = '''
+object meter {
+	name new_meter;
+	phases ABCN;
+	nominal_voltage 7200;
+}
+object overhead_line {
+	name new_line;
+	phases ABCN;
+	from p1_n11;
+	to new_meter;
+	length 100;
+}
+'''
+
+
+class RefreshTest(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.model_dir = os.path.join(self.dir, 'feeder')
+		shutil.copytree(os.path.join(FIXTURES, 'feeder'), self.model_dir)
+		self.cache = ParseCache(os.path.join(self.dir, 'cache'))
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def convert(self, **options):
+		with contextlib.redirect_stdout(io.StringIO()):
+			return Converter('main.glm', base_dir=self.model_dir, **options)
+
+	def edit(self, name, old, new):
+		path = os.path.join(self.model_dir, name)
+		with open(path) as f:
+			text = f.read()
+		self.assertIn(old, text)
+		with open(path, 'w') as f:
+			f.write(text.replace(old, new))
+
+	def test_refresh(self):
+		converter = self.convert(position_layout='radial', parse_cache=self.cache)
+		converter.to_json()
+		positions = {n['meta_props']['name']: (n['meta_props']['X_pos'], n['meta_props']['Y_pos']) for n in converter.lists['nodes']}
+
+		self.edit('part1.glm', 'length 170;', 'length 171;')
+		self.edit('part1.glm', 'object line_configuration {', NEW_NODE + 'object line_configuration {')
+		self.assertEqual(converter.refresh(), ['part1.glm'])
+
+		# the same objects as a full parse, in the same order
+		parsed = self.convert(calc_pos=False)
+		self.assertEqual(converter.to_glm_dict(), parsed.to_glm_dict())
+		self.assertEqual([n['meta_props']['name'] for n in converter.lists['nodes']], [n['meta_props']['name'] for n in parsed.lists['nodes']])
+		self.assertEqual(len(converter.lists['edges']), len(parsed.lists['edges']))
+
+		# nodes keep their positions, the new one is placed
+		for n in converter.lists['nodes']:
+			name = n['meta_props']['name']
+			if name in positions and name != 'NO_NAME_FOUND':
+				self.assertEqual((n['meta_props']['X_pos'], n['meta_props']['Y_pos']), positions[name])
+		new_node = converter.getObject('new_meter')
+		self.assertNotEqual((new_node['meta_props']['X_pos'], new_node['meta_props']['Y_pos']), ('0.0', '0.0'))
+
+		# the cache holds the refreshed model as it was parsed, without the
+		# positions it was laid out at
+		cached = self.convert(calc_pos=False, parse_cache=self.cache)
+		self.assertEqual(cached.to_json(), parsed.to_json())
+		self.assertEqual(cached.to_dot(), parsed.to_dot())
+
+	def test_geo(self):
+		model_dir = self.model_dir = os.path.join(self.dir, 'geo_feeder')
+		shutil.copytree(os.path.join(FIXTURES, 'geo_feeder'), model_dir)
+		converter = self.convert(calc_geo_pos=True, geo_projection='mercator')
+		converter.to_json()
+
+		# a node moved on the map moves in the layout, and gets the position
+		# a full layout would give it
+		self.edit('part0.glm', 'latitude 46.093780;', 'latitude 46.193780;')
+		self.assertEqual(converter.refresh(), ['part0.glm'])
+		laid_out = self.convert(calc_geo_pos=True, geo_projection='mercator')
+		laid_out.to_json()
+		self.assertEqual(converter.to_json(), laid_out.to_json())
+
+	def test_unchanged(self):
+		converter = self.convert(calc_pos=False)
+		self.assertEqual(converter.refresh(), [])
+
+
+if __name__ == '__main__':
+	unittest.main()
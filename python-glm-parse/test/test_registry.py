@@ -0,0 +1,114 @@
+import io
+import unittest
+import contextlib
+
+from types import MappingProxyType
+
+from glm_parse import Converter, register_glm_type
+from glm_parse.node import Node
+from glm_parse.edge import Edge
+from glm_parse.glm_registry import GLM_TYPES, NODE, EDGE, lookup_glm_type
+from glm_parse.file_system import MemoryFileSystem
+
+MODEL = '''object node {
+	name swing;
+	bustype SWING;
+}
+object helics_hub {
+	name hub_1;
+	parent swing;
+}
+object mystery_device {
+	name mystery_1;
+}
+object helics_hub {
+	name hub_2;
+}
+object fiber_link {
+	name link_1;
+	from hub_1;
+	to hub_2;
+}
+object mystery_device {
+	name mystery_2;
+}
+object other_device {
+	name other_1;
+}
+'''
+
+
+class HelicsHub(Node):
+	STYLE = MappingProxyType({'shape': 'house', 'fillcolor': '5'})
+
+
+class FiberLink(Edge):
+	STYLE = MappingProxyType({'style': 'dashed'})
+
+
+def convert(file_name = 'main.glm', files = None):
+	output = io.StringIO()
+	with contextlib.redirect_stdout(output):
+		converter = Converter(file_name, calc_pos=False, file_system=MemoryFileSystem(files or {'main.glm': MODEL}))
+	return converter, output.getvalue()
+
+
+# Types registered with register_glm_type are parsed like the built in ones,
+# objects of types without a class are counted and left out
+class RegistryTest(unittest.TestCase):
+
+	def setUp(self):
+		register_glm_type('helics_hub', HelicsHub)
+		register_glm_type('fiber_link', FiberLink)
+
+	def tearDown(self):
+		GLM_TYPES.pop('HelicsHub', None)
+		GLM_TYPES.pop('FiberLink', None)
+
+	def test_registered_types(self):
+		self.assertEqual(lookup_glm_type('HelicsHub').kind, NODE)
+		self.assertEqual(lookup_glm_type('FiberLink').kind, EDGE)
+		converter, _ = convert()
+		hub = converter.getObject('hub_1')
+		self.assertIsInstance(hub, HelicsHub)
+		self.assertIn(hub, converter.lists['nodes'])
+		self.assertIsInstance(converter.getObject('link_1'), FiberLink)
+		self.assertIn(converter.getObject('link_1'), converter.lists['edges'])
+		# parented like any node, and drawn with its own style
+		self.assertEqual([(e['meta_props']['from'], e['meta_props']['to']) for e in converter.lists['dummy_edges']], [('swing', 'hub_1')])
+		self.assertIn('shape="house"', hub.to_dot())
+		self.assertIn('style="dashed"', converter.getObject('link_1').to_dot())
+
+	def test_list_type(self):
+		register_glm_type('helics_hub', HelicsHub, 'other')
+		converter, _ = convert()
+		self.assertIn(converter.getObject('hub_1'), converter.lists['other'])
+		self.assertNotIn(converter.getObject('hub_1'), converter.lists['nodes'])
+
+	def test_not_a_glm_object(self):
+		with self.assertRaises(TypeError):
+			register_glm_type('helics_hub', dict)
+		with self.assertRaises(TypeError):
+			register_glm_type('helics_hub', HelicsHub())
+
+	def test_unknown_types(self):
+		converter, output = convert()
+		self.assertEqual(converter.unknown_types, {'MysteryDevice': 2, 'OtherDevice': 1})
+		# reported once per type
+		self.assertEqual(output.count('No class defined for MysteryDevice'), 1)
+		self.assertEqual(output.count('No class defined for OtherDevice'), 1)
+		self.assertEqual(converter.getObject('mystery_1'), None)
+
+	def test_unknown_types_json(self):
+		# objects of a type that was registered when the model was saved
+		converter, _ = convert()
+		files = {'model.json': converter.to_json()}
+		GLM_TYPES.pop('FiberLink')
+		reloaded, _ = convert('model.json', files)
+		self.assertEqual(reloaded.unknown_types, {'FiberLink': 1})
+		self.assertEqual(reloaded.getObject('link_1'), None)
+		self.assertIsInstance(reloaded.getObject('hub_1'), HelicsHub)
+
+
+if __name__ == '__main__':
+	unittest.main()
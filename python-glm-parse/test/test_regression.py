@@ -0,0 +1,198 @@
+import os
+import io
+import re
+import json
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+from itertools import chain
+from unittest import mock
+
+from glm_parse import Converter
+from glm_parse import glm_preprocessor
+from glm_parse import disk_cache
+from glm_parse.disk_cache import ParseCache
+from glm_parse.file_system import FileSystem, MemoryFileSystem
+from glm_parse.glm_registry import lookup_glm_type, glm_class_name
+
+# The fixture models are parsed in every mode the converter has, and the
+# JSON, GLM and DOT output compared to what the original converter made of
+# them (see fixtures/expected), so none of the speedups change the output.
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+# crlf is a file with \r\n line endings, which the lazy mode reads as bytes
+MODELS = ('feeder', 'geo_feeder', 'crlf')
+
+
+def expected(model, name):
+	with open(os.path.join(FIXTURES, 'expected', model, name)) as f:
+		return f.read()
+
+
+def convert(model, **options):
+	# the converters print progress (and the odd debug line)
+	with contextlib.redirect_stdout(io.StringIO()):
+		return Converter('main.glm', calc_pos=False, base_dir=os.path.join(FIXTURES, model), **options)
+
+
+# The nodes (by name) and edges of a DOT file with the attributes graphviz
+# gives them: the node/edge defaults in scope when a node is first declared
+# or an edge is made, then those on its line. A node declared again only
+# gets those on the line
+def dot_graph(text):
+	scopes = [{'node': {}, 'edge': {}}]
+	nodes = {}
+	edges = []
+	for line in text.split('\n')[1:]:
+		line = line.strip()
+		if line.startswith('subgraph'):
+			scopes.append({kind: dict(defaults) for kind, defaults in scopes[-1].items()})
+			continue
+		if line == '}':
+			scopes.pop()
+			continue
+		match = DOT_STATEMENT.match(line)
+		if match == None:
+			continue
+		head, attrs = match.group(1), dict(DOT_ATTR.findall(match.group(2) or ''))
+		if head in ('node', 'edge'):
+			scopes[-1][head].update(attrs)
+		elif ' -- ' in head:
+			edges.append((head, {**scopes[-1]['edge'], **attrs}))
+		elif head in nodes:
+			nodes[head].update(attrs)
+		else:
+			nodes[head] = {**scopes[-1]['node'], **attrs}
+	return nodes, sorted(edges, key = lambda edge: (edge[0], sorted(edge[1].items())))
+
+DOT_STATEMENT = re.compile(r'^([^\s\[;=]+(?: -- [^\s\[;]+)?)(?: \[(.*)\])?;$')
+DOT_ATTR = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+class RegressionTest(unittest.TestCase):
+
+	def assertOutput(self, model, converter):
+		self.assertEqual(converter.to_json(), expected(model, 'model.json'))
+		self.assertEqual(json.dumps(converter.to_glm_dict(), indent=1), expected(model, 'glm_files.json'))
+		self.assertEqual(converter.to_dot(), expected(model, 'model.dot'))
+
+	def test_default(self):
+		for model in MODELS:
+			with self.subTest(model=model):
+				self.assertOutput(model, convert(model))
+
+	def test_lazy(self):
+		for model in MODELS:
+			with self.subTest(model=model):
+				self.assertOutput(model, convert(model, lazy=True))
+
+	def test_columnar(self):
+		for model in MODELS:
+			with self.subTest(model=model):
+				self.assertOutput(model, convert(model, columnar=True))
+
+	def test_sharded(self):
+		# shards of a few hundred bytes, so every file is split, and a pool
+		# even on a single CPU
+		size = glm_preprocessor.MIN_SHARD_SIZE
+		glm_preprocessor.MIN_SHARD_SIZE = 256
+		try:
+			with mock.patch('os.cpu_count', return_value=2):
+				for model in MODELS:
+					with self.subTest(model=model):
+						self.assertOutput(model, convert(model, workers=2))
+		finally:
+			glm_preprocessor.MIN_SHARD_SIZE = size
+
+	def test_use_pool(self):
+		# the pool is only started with CPUs for the workers and enough to
+		# parse in files without directives
+		files = {'main.glm': '#include "feeder.glm";\n' + 'object node {\n\tname n0;\n}\n' * 20, 'feeder.glm': 'object node {\n\tname n1;\n}\n' * 20}
+		preprocessor = glm_preprocessor.GLMPreprocessor('main.glm', file_system=MemoryFileSystem(files))
+		size = glm_preprocessor.MIN_SHARD_SIZE
+		glm_preprocessor.MIN_SHARD_SIZE = len(files['feeder.glm'])
+		try:
+			with mock.patch('os.cpu_count', return_value=4):
+				self.assertTrue(preprocessor.use_pool(2))
+				self.assertFalse(preprocessor.use_pool(1))
+				self.assertFalse(preprocessor.use_pool(None))
+				glm_preprocessor.MIN_SHARD_SIZE += 1
+				self.assertFalse(preprocessor.use_pool(2))
+			glm_preprocessor.MIN_SHARD_SIZE = 0
+			for cpus in (1, None):
+				with mock.patch('os.cpu_count', return_value=cpus):
+					self.assertFalse(preprocessor.use_pool(2))
+		finally:
+			glm_preprocessor.MIN_SHARD_SIZE = size
+
+	def test_parse_cache(self):
+		cache_dir = tempfile.mkdtemp()
+		try:
+			for model in MODELS:
+				with self.subTest(model=model):
+					cache = ParseCache(cache_dir)
+					self.assertOutput(model, convert(model, parse_cache=cache))
+					self.assertEqual(len(cache.entries()), MODELS.index(model) + 1)
+					self.assertOutput(model, convert(model, parse_cache=cache))
+		finally:
+			shutil.rmtree(cache_dir)
+
+	def test_parse_cache_source(self):
+		# entries pickled by another version of the parser aren't loaded
+		cache_dir = tempfile.mkdtemp()
+		digest = disk_cache.source_digest()
+		try:
+			cache = ParseCache(cache_dir)
+			convert('feeder', parse_cache=cache)
+			disk_cache._source_digest = 'changed'
+			convert('feeder', parse_cache=cache)
+			self.assertEqual(len(cache.entries()), 2)
+		finally:
+			disk_cache._source_digest = digest
+			shutil.rmtree(cache_dir)
+
+	def test_json_reload(self):
+		out_dir = tempfile.mkdtemp()
+		try:
+			for model in MODELS:
+				with self.subTest(model=model):
+					json_file = os.path.join(out_dir, model + '.json')
+					convert(model).writeJson(json_file)
+					with contextlib.redirect_stdout(io.StringIO()):
+						reloaded = Converter(json_file, calc_pos=False)
+					self.assertEqual(reloaded.to_json(), expected(model, 'reload.json'))
+		finally:
+			shutil.rmtree(out_dir)
+
+	def test_compact_dot(self):
+		# the class subgraphs and their defaults make the same graph
+		for model in MODELS:
+			with self.subTest(model=model):
+				converter = convert(model)
+				compact = dot_graph(converter.to_dot(compact=True))
+				self.assertEqual(compact, dot_graph(converter.to_dot()))
+				self.assertTrue(compact[0] and compact[1])
+
+	def test_iter_objects(self):
+		# streaming the objects of a file gives what the eager parse made of
+		# those that have a class
+		for model in MODELS:
+			converter = convert(model)
+			file_system = FileSystem(os.path.join(FIXTURES, model))
+			for file_name in converter.glm_lines:
+				with self.subTest(model=model, file_name=file_name):
+					parsed = [obj for obj in chain(converter.lists['nodes'], converter.lists['edges'], converter.lists['configs'], converter.lists['other'])
+						if obj['meta_props']['file_name'] == file_name]
+					parsed.sort(key = lambda obj: obj['meta_props']['line_number'])
+					streamed = [(glm_class_name(obj_type), index, props, comments, line_number)
+						for obj_type, index, props, comments, line_number in Converter.iter_objects(file_name, file_system)]
+					streamed = [record for record in streamed if lookup_glm_type(record[0]) != None]
+					self.assertTrue(streamed)
+					self.assertEqual(streamed, [(obj['meta_props']['obj_type'], obj['meta_props']['id'], obj['glm_props'], obj['comments'], obj['meta_props']['line_number'])
+						for obj in parsed])
+
+
+if __name__ == '__main__':
+	unittest.main()
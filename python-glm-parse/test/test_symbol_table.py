@@ -0,0 +1,96 @@
+import os
+import io
+import unittest
+import contextlib
+
+from glm_parse import Converter
+from glm_parse import grab_info_mixin
+from glm_parse.grab_info_mixin import prop_kind, POWER, AREA
+from glm_parse.symbol_table import SymbolTable
+from glm_parse.glm_tokenizer import split_lines
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+BODY = '\tname meter_1;\n\tphases ABCN;\n\tnominal_voltage 7200;\n\tparent swing;\n'
+
+
+# a copy of the string that isn't the same object
+def copy(text):
+	return ''.join(list(text))
+
+
+class SymbolTableTest(unittest.TestCase):
+
+	def test_intern(self):
+		symbols = SymbolTable()
+		first = symbols.intern(copy('ABCN'))
+		self.assertIs(symbols.intern(copy('ABCN')), first)
+		self.assertEqual(symbols.intern(7200), 7200)
+		self.assertEqual(symbols.stats(), {'symbols': 1, 'lookups': 2, 'duplicates': 1})
+		self.assertEqual(str(symbols), '1 symbols, 1 of 2 strings deduplicated')
+
+	def test_unique_props(self):
+		# names and the like are left out of the table, their keys aren't
+		symbols = SymbolTable()
+		props = symbols.intern_dict({'name': 'meter_1', 'phases': 'ABCN', 'line_number': 4})
+		self.assertEqual(props, {'name': 'meter_1', 'phases': 'ABCN', 'line_number': 4})
+		self.assertEqual(set(symbols.symbols), {'name', 'phases', 'ABCN', 'line_number'})
+		self.assertEqual(symbols.stats(), {'symbols': 4, 'lookups': 4, 'duplicates': 0})
+
+	def test_parse_body(self):
+		symbols = SymbolTable()
+		first, _ = symbols.parse_body(split_lines(BODY))
+		second, _ = symbols.parse_body(split_lines(BODY.replace('meter_1', 'meter_2')))
+		self.assertEqual(second, {'name': 'meter_2', 'phases': 'ABCN', 'nominal_voltage': '7200', 'parent': 'swing'})
+		self.assertIs(second['phases'], first['phases'])
+		self.assertNotIn('meter_1', symbols.symbols)
+		self.assertNotIn('swing', symbols.symbols)
+		# 4 names and 2 values looked up per object, the second time all of
+		# them were there
+		self.assertEqual(symbols.stats(), {'symbols': 6, 'lookups': 12, 'duplicates': 6})
+		self.assertEqual(symbols.intern_props(first), first)
+		self.assertEqual(symbols.stats(), {'symbols': 6, 'lookups': 18, 'duplicates': 12})
+
+	def test_max_size(self):
+		# a full table hands out the strings it has, and keeps no others
+		symbols = SymbolTable(max_size = 4)
+		symbols.parse_body(split_lines(BODY))
+		self.assertEqual(len(symbols.symbols), 6)
+		props, _ = symbols.parse_body(split_lines(BODY.replace('ABCN', 'AN')))
+		self.assertEqual(props['phases'], 'AN')
+		self.assertIs(props['nominal_voltage'], symbols.symbols['7200'])
+		self.assertEqual(symbols.intern(copy('BN')), 'BN')
+		self.assertNotIn('AN', symbols.symbols)
+		self.assertNotIn('BN', symbols.symbols)
+		self.assertEqual(symbols.stats(), {'symbols': 6, 'lookups': 13, 'duplicates': 5})
+
+	def test_converter(self):
+		with contextlib.redirect_stdout(io.StringIO()):
+			converter = Converter('main.glm', calc_pos=False, base_dir=os.path.join(FIXTURES, 'feeder'))
+		stats = converter.symbols.stats()
+		self.assertEqual(stats['symbols'], len(converter.symbols.symbols))
+		self.assertTrue(0 < stats['duplicates'] < stats['lookups'])
+		names = [obj['meta_props']['name'] for obj in converter.lists['nodes']]
+		self.assertFalse(set(names) & set(converter.symbols.symbols) - {'NO_NAME_FOUND'})
+
+
+class PropKindTest(unittest.TestCase):
+
+	def test_bounded(self):
+		kinds = grab_info_mixin._prop_kinds
+		size = grab_info_mixin.MAX_PROP_KINDS
+		grab_info_mixin._prop_kinds = {}
+		grab_info_mixin.MAX_PROP_KINDS = 2
+		try:
+			self.assertEqual(prop_kind('constant_power_A'), POWER)
+			self.assertEqual(prop_kind('floor_area'), AREA)
+			self.assertEqual(prop_kind('phases'), None)
+			self.assertEqual(prop_kind('constant_power_B'), POWER)
+			self.assertEqual(len(grab_info_mixin._prop_kinds), 2)
+		finally:
+			grab_info_mixin._prop_kinds = kinds
+			grab_info_mixin.MAX_PROP_KINDS = size
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from glm_parse import Converter
+from benchmark import write_feeder
+
+FEEDERS = 16
+THREADS = 8
+
+
+# Feeders in their own directories (each a main file including a feeder with
+# the same name as in the others) parsed in a thread pool give the same
+# results as parsed alone. Converters only use their own base_dir, so
+# threads can't pick up each other's files.
+class ThreadTest(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.dirs = []
+		for i in range(FEEDERS):
+			feeder_dir = os.path.join(self.dir, 'feeder_{}'.format(i))
+			os.makedirs(feeder_dir)
+			write_feeder(os.path.join(feeder_dir, 'feeder.glm'), 50 + 10 * i, 2)
+			with open(os.path.join(feeder_dir, 'main.glm'), 'w') as outfile:
+				outfile.write('#include "feeder.glm";\n')
+			self.dirs.append(feeder_dir)
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	@staticmethod
+	def parse(feeder_dir):
+		converter = Converter('main.glm', calc_pos=False, base_dir=feeder_dir)
+		return converter.to_json(indent=None), converter.to_glm()
+
+	def test_threads(self):
+		expected = [self.parse(d) for d in self.dirs]
+		with ThreadPoolExecutor(THREADS) as pool:
+			results = list(pool.map(self.parse, self.dirs * 4))
+		for i, result in enumerate(results):
+			self.assertEqual(result, expected[i % FEEDERS])
+
+
+if __name__ == '__main__':
+	unittest.main()
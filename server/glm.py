@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from werkzeug.utils import secure_filename
 from glm_parse import Converter
 from graphviz import Source
@@ -137,6 +137,9 @@ def loadJsonFile(fullFileName):
 	jsonFile = open(fullFileName)
 	jsonContent = jsonFile.read()
 	jsonStruct = json.loads(jsonContent)
+	# projects imported by older versions stored the GLM-JSON as a string
+	if isinstance(jsonStruct, str):
+		jsonStruct = json.loads(jsonStruct)
 	return jsonStruct
 
 def JsonFileInforamtion(jsonStruct):
@@ -157,8 +160,8 @@ def JsonFileInforamtion(jsonStruct):
 		}
 
 def parseFiletoJson(serverFileName):
-    parsedGlm = Converter(serverFileName, calc_pos=True, verbose=False, position_layout='graphviz')
-    json_out = json.loads(parsedGlm.to_json())
+    parsedGlm = Converter(serverFileName, calc_pos=True, verbose=False, position_layout='graphviz', layout_cache=current_app.config.get('LAYOUT_CACHE'), parse_cache=current_app.config.get('PARSE_CACHE'))
+    json_out = json.loads(parsedGlm.to_json(indent=None))
     # send results to client
     return json_out
 
@@ -172,8 +175,10 @@ def exportPdf():
         jsonFileName = request.get_json()['server-file-name']
 
         pdfFileName = jsonFileName[:-5]+"_power"
-        parsedGlm = Converter(jsonFileName, calc_pos=True, verbose=False, position_layout='graphviz')
-        src = Source(parsedGlm.to_dot(), filename=pdfFileName, engine='dot', format='pdf')
+        # the saved project keeps the positions the user laid out or moved,
+        # only the nodes without one are placed around them
+        parsedGlm = Converter(jsonFileName, calc_pos=True, verbose=False, position_layout='incremental')
+        src = Source(parsedGlm.to_dot(compact=True), filename=pdfFileName, engine='dot', format='pdf')
         src.render(directory=os.getcwd())
 
         data = jsonify({
@@ -235,7 +240,8 @@ def downloadFile():
         timeString = request.get_json()['time-string']
 
         pdfFileName = jsonFileName[:-5]+"_power"
-        parsedGlm = Converter(jsonFileName, calc_pos=True, verbose=False, position_layout='graphviz')
+        # only glm is written, so there is nothing to lay out
+        parsedGlm = Converter(jsonFileName, calc_pos=False, verbose=False)
         download_path = get_download_path()
         download_path += '\\Netviz_Output'+timeString+'\power_files\\'
         os.makedirs(download_path,exist_ok=True)
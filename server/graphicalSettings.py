@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from cors import cors_prelight_response, cors_actual_response
 from werkzeug.utils import secure_filename
+from glm_parse.glm_registry import class_styles
 import os
 import json
 
@@ -47,4 +48,11 @@ def getGraphicalSettings():
 			"message": "success"
 		})
 
-		return cors_actual_response(data), 200
\ No newline at end of file
+		return cors_actual_response(data), 200
+
+# The styles the node and edge classes are drawn with, by class name
+@graphicalSettings.route("/class-styles", methods=["GET", "OPTIONS"])
+def getClassStyles():
+	if request.method == "OPTIONS": # CORS - Cross Origin Script
+		return cors_prelight_response(),201
+	return cors_actual_response(jsonify(class_styles())), 200
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from cors import cors_prelight_response, cors_actual_response
 from werkzeug.utils import secure_filename
 from glm_parse import Converter
@@ -169,22 +169,18 @@ def checkProjectFile():
 				else:
 					file_path_arr = file_path.split('/')
 
-				home_dir = os.getcwd()
-				
 				if platform.system() == "Windows":
 					file_dir = '\\'.join(file_path_arr[0:-1])
 				else:
 					file_dir = '/'.join(file_path_arr[0:-1])
 
-
-				#change directory to load included files by file path found in selected glm file
-				os.chdir(file_dir)
-				parsedGlm = Converter(file_path_arr[-1], calc_pos=True, verbose=False, position_layout='graphviz')
-				#change back to previous working directory
-				os.chdir(home_dir)
+				# included files are loaded relative to the selected glm file's
+				# directory, without changing the working directory of the server
+				parsedGlm = Converter(file_path_arr[-1], calc_pos=True, verbose=False, position_layout='graphviz', layout_cache=current_app.config.get('LAYOUT_CACHE'), parse_cache=current_app.config.get('PARSE_CACHE'), base_dir=file_dir)
 				
 				inFileNameAsJson = inFileName.replace('.glm', '.json')
-				parsedGlm.writeJson(inFileNameAsJson)
+				# the converter resolves relative names against file_dir
+				parsedGlm.writeJson(os.path.abspath(inFileNameAsJson))
 				data = JsonFileInforamtion(inFileNameAsJson)
 			else:
 				data = {
@@ -255,12 +251,12 @@ def importProject():
 
 		# If the imported file was a GLM file, convert the GLM to a GLM-JSON, then set the powerFile value to the file path in the projects folder
 		if jsonImportData['fileType'] == 'GLM':
-			parsedGlm = Converter(projectImportFilePath, calc_pos=True, verbose=False, position_layout='graphviz')
+			parsedGlm = Converter(projectImportFilePath, calc_pos=True, verbose=False, position_layout='graphviz', layout_cache=current_app.config.get('LAYOUT_CACHE'), parse_cache=current_app.config.get('PARSE_CACHE'))
 			projectImportFilePathAsJson = projectImportFilePath.replace('.glm', '.json')
 			jsonProjectData['powerFile'] = projectImportFilePathAsJson
 
-			with open(projectImportFilePathAsJson, 'w') as outfile:
-				json.dump(parsedGlm.to_json(), outfile, indent=4, sort_keys=True)
+			# streamed straight to the file as GLM-JSON, without indentation
+			parsedGlm.writeJson(projectImportFilePathAsJson, indent=None)
 
 		# If the imported file was a linkages file, set the linkagesFile value to the file path in the projects folder
 		if jsonImportData['fileType'] == 'Linkages':
@@ -7,10 +7,18 @@ from nnd import nnd as nnd_blueprint
 from pdf import pdf as pdf_blueprint
 from graphicalSettings import graphicalSettings as graphicalSettings_blueprint
 from linkages import linkages as linkages_blueprint
+from glm_parse import LayoutCache, ParseCache
 
 def create_app() -> Flask:
 	app = Flask(__name__, static_folder="")
 
+	# node positions of feeders laid out before, shared by all the routes.
+	# The path is made absolute so it stays the directory the server was
+	# started in
+	app.config['LAYOUT_CACHE'] = LayoutCache(os.path.join(os.getcwd(), '.layout-cache'))
+	# parsed models, so reopening or exporting an unchanged project is quick
+	app.config['PARSE_CACHE'] = ParseCache(os.path.join(os.getcwd(), '.parse-cache'))
+
 	# Serve React App
 	@app.route('/', defaults={'path': ''})
 	@app.route('/<path:path>')